@@ -0,0 +1,116 @@
+import bisect
+import math
+import time
+
+from FileTable import SECONDS_PER_DAY
+from SizeHistogram import DEFAULT_BOUNDARIES, make_labels
+
+# Upper (inclusive) ages in whole days of the default age bins:
+# 0-1d, 1-7d, 7-30d, 30-90d, 90-180d, 180-365d, 365-730d, >730d
+DEFAULT_AGE_BOUNDARIES = [1, 7, 30, 90, 180, 365, 730]
+
+
+class AgeSizeHistogram:
+    # file count and total size per (age bucket, size bucket) pair, filled in the same pass as the size bins.
+    # How much is older than N days and at least M large is a sum over the buckets for any N and M, no file is
+    # read again. Ages are whole days measured against now, the start of the scan, with the same rounding as
+    # the cleaner and the age> filters, so a threshold on an age boundary is counted exactly
+    def __init__(self, size_boundaries=None, age_boundaries=None, age_policy='atime', now=None):
+        self.size_boundaries = sorted(DEFAULT_BOUNDARIES if size_boundaries is None else size_boundaries)
+        self.age_boundaries = sorted(DEFAULT_AGE_BOUNDARIES if age_boundaries is None else age_boundaries)
+        self.size_labels = make_labels(self.size_boundaries)
+        self.age_labels = make_age_labels(self.age_boundaries)
+        self.age_policy = age_policy  # atime, mtime or ctime, see AGE_POLICIES in FileTable
+        self.now = time.time() if now is None else now
+        # age bucket i holds age_boundaries[i - 1] < age <= age_boundaries[i], the last bucket is open ended. A file
+        # is older than b days when its timestamp is at or before now - (b + 1) days, so the buckets are found by
+        # bisecting the timestamps with the cutoffs instead of computing every age
+        self.cutoffs = [self.now - (boundary + 1) * SECONDS_PER_DAY for boundary in reversed(self.age_boundaries)]
+        self.num_of_size_buckets = len(self.size_boundaries) + 1
+        # bucket (age bucket i, size bucket j) is at i * num_of_size_buckets + j
+        self.counts = [0] * ((len(self.age_boundaries) + 1) * self.num_of_size_buckets)
+        self.totals = [0] * len(self.counts)
+        self.max_size = 0  # upper ends of the open ended buckets for the interpolation
+        self.oldest_timestamp = math.inf
+
+    def bucket(self, size, timestamp):
+        age_bucket = len(self.cutoffs) - bisect.bisect_left(self.cutoffs, timestamp)
+        return age_bucket * self.num_of_size_buckets + bisect.bisect_right(self.size_boundaries, size)
+
+    def add(self, size, timestamp):
+        self.add_many([size], [timestamp])
+
+    def add_many(self, sizes, timestamps):  # bins a batch of files, e.g. all files of a directory
+        size_boundaries = self.size_boundaries
+        cutoffs = self.cutoffs
+        num_of_cutoffs = len(cutoffs)
+        num_of_size_buckets = self.num_of_size_buckets
+        counts = self.counts
+        totals = self.totals
+        for size, timestamp in zip(sizes, timestamps):
+            bucket = ((num_of_cutoffs - bisect.bisect_left(cutoffs, timestamp)) * num_of_size_buckets
+                      + bisect.bisect_right(size_boundaries, size))
+            counts[bucket] += 1
+            totals[bucket] += size
+        if sizes:
+            self.max_size = max(self.max_size, max(sizes))
+            self.oldest_timestamp = min(self.oldest_timestamp, min(timestamps))
+
+    def remove_many(self, sizes, timestamps):  # unbins files removed after the scan, the upper ends are left as bounds
+        for size, timestamp in zip(sizes, timestamps):
+            bucket = self.bucket(size, timestamp)
+            self.counts[bucket] -= 1
+            self.totals[bucket] -= size
+
+    def merge(self, other):  # the buckets of other are taken as they are, so both must be binned against the same now
+        if other.now != self.now:
+            raise ValueError('age bins measured against another time can not be merged, bin the files again')
+        for bucket in range(len(self.counts)):
+            self.counts[bucket] += other.counts[bucket]
+            self.totals[bucket] += other.totals[bucket]
+        self.max_size = max(self.max_size, other.max_size)
+        self.oldest_timestamp = min(self.oldest_timestamp, other.oldest_timestamp)
+
+    def older_than(self, days, min_size=0):
+        # (count, total size) of the files older than days with at least min_size bytes. Exact when days is an age
+        # boundary and min_size a size boundary, a bucket crossed by a threshold is interpolated linearly
+        max_age = 0 if self.oldest_timestamp == math.inf else (self.now - self.oldest_timestamp) // SECONDS_PER_DAY
+        count = total_size = 0
+        for age_bucket in range(len(self.age_boundaries) + 1):
+            # whole day ages of the bucket are lower + 1 ... upper
+            lower = self.age_boundaries[age_bucket - 1] if age_bucket > 0 else -1
+            upper = (self.age_boundaries[age_bucket] if age_bucket < len(self.age_boundaries)
+                     else max(max_age, lower + 1))
+            age_share = share(lower, upper, days)
+            if age_share == 0:
+                continue
+            for size_bucket in range(self.num_of_size_buckets):
+                # sizes of the bucket are lower ... upper - 1
+                size_lower = self.size_boundaries[size_bucket - 1] if size_bucket > 0 else 0
+                size_upper = (self.size_boundaries[size_bucket] if size_bucket < len(self.size_boundaries)
+                              else max(self.max_size + 1, size_lower + 1))
+                bucket_share = age_share * share(size_lower, size_upper, min_size)
+                bucket = age_bucket * self.num_of_size_buckets + size_bucket
+                count += self.counts[bucket] * bucket_share
+                total_size += self.totals[bucket] * bucket_share
+        return round(count), round(total_size)
+
+    def rows(self):  # (age label, size label, count, total size) of every bucket, youngest and smallest first
+        for age_bucket, age_label in enumerate(self.age_labels):
+            for size_bucket, size_label in enumerate(self.size_labels):
+                bucket = age_bucket * self.num_of_size_buckets + size_bucket
+                yield age_label, size_label, self.counts[bucket], self.totals[bucket]
+
+
+def share(lower, upper, threshold):  # part of the range lower ... upper that lies above threshold
+    return min(max((upper - max(threshold, lower)) / (upper - lower), 0), 1)
+
+
+def make_age_labels(boundaries):
+    labels = []
+    lower = 0
+    for upper in boundaries:
+        labels.append(str(lower) + '-' + str(upper) + 'd')
+        lower = upper
+    labels.append('>' + str(lower) + 'd')
+    return labels
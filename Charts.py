@@ -0,0 +1,119 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Plotting related stuff, imported by import_plotting once a chart is drawn
+plt = None
+matplotlib = None
+squarify = None
+
+CHART_FORMATS = ['png', 'svg']
+# rc settings of the extension charts, applied to their figures only
+PLOT_STYLE = {'axes.facecolor': '#E6E6E6', 'axes.edgecolor': 'none', 'axes.axisbelow': True, 'axes.grid': True,
+              'grid.color': 'w', 'grid.linestyle': 'solid', 'xtick.direction': 'out', 'xtick.color': 'gray',
+              'ytick.direction': 'out', 'ytick.color': 'gray', 'patch.edgecolor': '#E6E6E6', 'lines.linewidth': 2}
+TITLE_FONT = {'fontsize': 23, 'fontweight': 'bold'}
+
+# A chart is drawn by calling draw(*args) on a new figure. The arguments are plain lists and strings, so a chart
+# can be drawn in this process and shown, or pickled to a worker process and saved there
+Chart = namedtuple('Chart', ['name', 'draw', 'args'])
+
+
+def import_plotting(backend=None):
+    # matplotlib and squarify take most of the start up time, headless runs never import them
+    global plt
+    global matplotlib
+    global squarify
+
+    if plt is None:
+        import matplotlib
+        if backend is not None:
+            matplotlib.use(backend)
+        import matplotlib.pyplot as plt
+        import squarify
+
+
+def show_charts(charts):  # opens a window per chart, the windows are shown together and block until closed
+    import_plotting()
+    for chart in charts:
+        chart.draw(*chart.args)
+    plt.show()
+
+
+def render_charts(charts, directory, chart_format='png', workers=None):
+    # Draws the charts off-screen with the Agg backend in worker processes, one file per chart in directory.
+    # Returns the paths of the files
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, chart.name + '.' + chart_format) for chart in charts]
+    if not charts:
+        return paths
+    with ProcessPoolExecutor(min(workers or os.cpu_count() or 1, len(charts)), initializer=import_plotting,
+                             initargs=('Agg',)) as pool:
+        list(pool.map(render_chart, charts, paths))
+    return paths
+
+
+def render_chart(chart, path):
+    import_plotting('Agg')
+    chart.draw(*chart.args)
+    plt.savefig(path)
+    plt.close('all')
+
+
+def draw_bar(x, y, title, xlabel, ylabel, figsize=(15, 7), title_font=None, styled=False):
+    with plt.rc_context(PLOT_STYLE if styled else {}):
+        plt.figure(figsize=figsize)
+        plt.bar(x, y, align='edge', width=0.8)
+        plt.title(title, **(TITLE_FONT if title_font is None else title_font))
+        plt.xlabel(xlabel, fontsize=25)
+        plt.ylabel(ylabel, fontsize=25)
+        plt.xticks(fontsize=8, fontweight='bold')
+        plt.yticks(fontsize=8, fontweight='bold')
+
+
+def draw_treemap(labels, sizes, title):
+    with plt.rc_context(PLOT_STYLE):
+        plt.figure()
+        try:
+            squarify.plot(label=labels, sizes=sizes, color=generate_blue_color_map(sizes))
+            plt.title(title, **TITLE_FONT)
+            plt.axis('off')  # Remove our axes and display the plot
+        except Exception:
+            print('An unexpected error occurred while displaying the treemap')
+
+
+def draw_directory_treemap(title, boxes):
+    # two level treemap, boxes holds the (label, total size, sizes of the children) of the top directories, the
+    # children are drawn as outlines inside the box of their directory
+    width, height = 100, 100
+    sizes = [size for _, size, _ in boxes]
+    rects = squarify.squarify(squarify.normalize_sizes(sizes, width, height), 0, 0, width, height)
+    color_map = generate_blue_color_map(sizes)
+
+    plt.figure(figsize=(20, 12))
+    axes = plt.gca()
+    for (label, _, child_sizes), rect, color in zip(boxes, rects, color_map):
+        axes.add_patch(matplotlib.patches.Rectangle((rect['x'], rect['y']), rect['dx'], rect['dy'],
+                                                    facecolor=color, edgecolor='white', linewidth=3))
+        if child_sizes:
+            child_rects = squarify.squarify(squarify.normalize_sizes(child_sizes, rect['dx'], rect['dy']),
+                                            rect['x'], rect['y'], rect['dx'], rect['dy'])
+            for child_rect in child_rects:
+                axes.add_patch(matplotlib.patches.Rectangle((child_rect['x'], child_rect['y']), child_rect['dx'],
+                                                            child_rect['dy'], fill=False, edgecolor='white',
+                                                            linewidth=0.5))
+        plt.text(rect['x'] + rect['dx'] / 2, rect['y'] + rect['dy'] / 2, label, ha='center', va='center',
+                 fontsize=8)
+
+    plt.xlim(0, width)
+    plt.ylim(0, height)
+    plt.title(title, **TITLE_FONT)
+    plt.axis('off')
+
+
+def generate_blue_color_map(data_set):
+    cmap = matplotlib.cm.Blues
+    min_value = min(data_set)
+    max_value = max(data_set)
+    norm = matplotlib.colors.Normalize(vmin=min_value, vmax=max_value)
+    return [cmap(norm(value)) for value in data_set]
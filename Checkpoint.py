@@ -0,0 +1,69 @@
+import os
+import pickle
+
+CHECKPOINT_VERSION = 2  # checkpoints written with another version are refused by resume
+
+
+class Checkpoint:
+    # Append only log of a running scan: a header with the settings and the start of the scan, then one record
+    # per checkpoint with the ScanStats of the dirs listed since the record before and the dirs still to be listed
+    # at that moment. Records are never rewritten, so a checkpoint costs as much as the work done since the last one.
+    # A record cut short by a kill is dropped by resume, the records before it are complete on their own
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings  # statistics of a scan only continue a scan of the same root with the same settings
+        self.file = None
+        self.started = None  # time.time() the scan started, set by start and resume
+
+    def start(self, started):  # starts a new log, the log of an older scan at path is overwritten
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.file = open(self.path, 'wb')
+        self.started = started
+        pickle.dump((CHECKPOINT_VERSION, self.settings, started), self.file)
+        self.sync()
+
+    def resume(self, new_stats):
+        # Returns the ScanStats of every dir listed before the last checkpoint and the dirs that were still to be
+        # listed then, None if no checkpoint was written. Raises OSError or ValueError. Further checkpoints are
+        # appended to the same log
+        self.file = open(self.path, 'r+b')
+        try:
+            header = pickle.load(self.file)
+        except (EOFError, pickle.UnpicklingError):
+            header = None
+        if not isinstance(header, tuple) or header[:2] != (CHECKPOINT_VERSION, self.settings):
+            self.close()
+            raise ValueError('The checkpoint was written by a scan of another root or with other settings')
+        self.started = header[2]
+
+        stats = new_stats()
+        pending_dirs = None
+        end = self.file.tell()
+        while True:
+            try:
+                record_stats, record_dirs = pickle.load(self.file)
+            except (EOFError, pickle.UnpicklingError):  # the end of the log or a record cut short
+                break
+            stats.merge(record_stats)
+            pending_dirs = record_dirs
+            end = self.file.tell()
+        self.file.seek(end)
+        self.file.truncate()
+        return stats, pending_dirs
+
+    def save(self, stats, pending_dirs):  # stats holds the dirs listed since the last save only
+        pickle.dump((stats, pending_dirs), self.file, pickle.HIGHEST_PROTOCOL)
+        self.sync()
+
+    def sync(self):  # a checkpoint must survive the crash of the machine as well, not only of the process
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self):  # the scan is complete, there is nothing left to resume
+        self.close()
+        os.remove(self.path)
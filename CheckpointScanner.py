@@ -0,0 +1,115 @@
+import math
+import time
+
+from Scanner import Scanner
+from ScanStats import ScanStats
+
+
+class CheckpointScanner(Scanner):
+    # Appends a checkpoint of the scan to a Checkpoint log every interval seconds, a killed scan goes on from
+    # its last checkpoint after load. The workers are paused between two dirs while a checkpoint is written, so
+    # every dir is either in the saved statistics or among the saved dirs still to be listed, never in both
+    def __init__(self, checkpoint, root_dir, workers=1, rules=None, new_stats=ScanStats, interval=60,
+                 max_overhead=0.05):
+        super().__init__(root_dir, workers=workers, rules=rules, new_stats=new_stats)
+        self.checkpoint = checkpoint
+        self.interval = interval  # seconds between two checkpoints
+        # writing a checkpoint takes longer as the frontier grows, the next one waits until the time spent
+        # writing is at most this share of the scan
+        self.max_overhead = max_overhead
+        self.saved_stats = None  # ScanStats of the dirs listed before the last checkpoint
+        self.resumed_dirs = None  # dirs still to be listed at the last checkpoint, set by load
+        self.listing_dirs = 0  # dirs taken off the queues and not added to the statistics yet
+        self.pausing = False  # no dir is taken off the queues while a checkpoint waits for the listing dirs
+        self.next_checkpoint = math.inf  # perf_counter time of the next checkpoint
+        self.num_of_checkpoints = 0
+        self.checkpoint_error = None  # OSError of a failed write, no checkpoint is written after it
+
+    def load(self):
+        # the scan goes on from the last checkpoint instead of the root, raises OSError or ValueError. The ages are
+        # measured from now on, the saved files are binned again when they are merged
+        self.saved_stats, self.resumed_dirs = self.checkpoint.resume(self.new_worker_stats)
+
+    def scan(self):
+        if self.saved_stats is None:
+            self.checkpoint.start(self.now)
+            self.saved_stats = self.new_worker_stats()
+        worker_stats = [self.new_worker_stats() for _ in range(self.workers)]
+        # the saved statistics come last, a worker finds its own by its id and the progress line counts them all
+        self.worker_stats = worker_stats + [self.saved_stats]
+        for path in [self.root_dir] if self.resumed_dirs is None else self.resumed_dirs:
+            self.queue_dir(0, path)
+
+        self.next_checkpoint = time.perf_counter() + self.interval
+        try:
+            self.run_workers(worker_stats)
+        except BaseException:
+            self.checkpoint.close()  # interrupted, the log is kept for the next load
+            raise
+        self.checkpoint.remove()
+        return self.merge(self.worker_stats[-1:] + self.worker_stats[:-1])
+
+    def work(self, worker_id, stats):  # stats is replaced by every checkpoint, the current one is in worker_stats
+        while True:
+            path = self.next_dir(worker_id)
+            if path is None:
+                return
+            try:
+                self.scan_dir(worker_id, path, self.worker_stats[worker_id])
+            finally:
+                with self.work_available:
+                    self.pending_dirs -= 1
+                    self.listing_dirs -= 1
+                    if self.pending_dirs == 0 or (self.pausing and self.listing_dirs == 0):
+                        self.work_available.notify_all()
+            # not reached when the listing raised, a half listed dir is never saved
+            if time.perf_counter() >= self.next_checkpoint:
+                self.save()
+
+    def next_dir(self, worker_id):  # dirs are taken off the queues under the lock, so a pause can count them
+        with self.work_available:
+            while True:
+                if not self.pausing:
+                    path = self.pop_dir(worker_id)
+                    if path is not None:
+                        self.listing_dirs += 1
+                        return path
+                    if self.pending_dirs == 0:
+                        return None
+                self.work_available.wait()
+
+    def pop_dir(self, worker_id):  # own dirs from the right, the oldest dirs of the others from the left
+        if self.queues[worker_id]:
+            return self.queues[worker_id].pop()
+        for victim in self.queues:
+            if victim:
+                return victim.popleft()
+        return None
+
+    def save(self):
+        with self.work_available:
+            if self.pausing or self.pending_dirs == 0 or time.perf_counter() < self.next_checkpoint:
+                return  # another worker is writing the checkpoint, or the scan is over
+            self.pausing = True
+            try:
+                while self.listing_dirs > 0:
+                    self.work_available.wait()
+                start = time.perf_counter()
+                stats = self.worker_stats[0]
+                for other in self.worker_stats[1:self.workers]:
+                    stats.merge(other)
+                self.worker_stats[:self.workers] = [self.new_worker_stats() for _ in range(self.workers)]
+                try:
+                    self.checkpoint.save(stats, [path for queue in self.queues for path in queue])
+                    self.num_of_checkpoints += 1
+                except OSError as error:
+                    self.checkpoint_error = error
+                self.saved_stats.merge(stats)
+                duration = time.perf_counter() - start
+                if self.checkpoint_error is None:
+                    self.next_checkpoint = time.perf_counter() + max(self.interval, duration / self.max_overhead)
+                else:
+                    self.next_checkpoint = math.inf
+            finally:
+                self.pausing = False
+                self.work_available.notify_all()
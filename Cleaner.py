@@ -0,0 +1,48 @@
+import heapq
+import time
+
+from FileTable import SECONDS_PER_DAY
+
+
+class Cleaner:  # Ranks the not recently accessed files of a FileTable by their delete priority
+    def __init__(self, table, threshold_days, size_coefficient, age_coefficient, normalization_rate,
+                 age_policy='atime'):
+        self.table = table
+        self.age_policy = age_policy  # atime, mtime or ctime, see AGE_POLICIES in FileTable
+        self.threshold_days = threshold_days
+        self.size_coefficient = size_coefficient
+        self.age_coefficient = age_coefficient
+        self.normalization_rate = normalization_rate
+
+    def rank(self, k, now=None):
+        # Returns the (delete priority, row) pairs of the k files with the highest priority, highest first.
+        # Nothing is stored between calls, so ranking again gives the same answer for the same table
+        if now is None:
+            now = time.time()
+        table = self.table
+        timestamps = table.timestamps(self.age_policy)
+        extension_ids = table.extension_ids
+        no_extension_id = table.extension_ids_by_name.get('')
+        # age in whole days is above the threshold exactly when the timestamp is before the cutoff,
+        # so the candidates are selected on the raw column without computing every age
+        cutoff = now - (self.threshold_days + 1) * SECONDS_PER_DAY
+        candidates = [row for row, timestamp in enumerate(timestamps) if timestamp <= cutoff]
+        if no_extension_id is not None:
+            candidates = [row for row in candidates if extension_ids[row] != no_extension_id]
+
+        age_weight = self.age_coefficient
+        size_weight = self.size_coefficient * self.normalization_rate
+        sizes = table.sizes
+        scores = [((now - timestamps[row]) // SECONDS_PER_DAY) * age_weight + sizes[row] * size_weight
+                  for row in candidates]
+        # partial selection, only k items are ever kept in order
+        ranked = heapq.nlargest(k, zip(scores, candidates))
+        if not ranked:
+            return ranked
+        # files of the same size and age have equal scores, and the rows depend on the order the scan workers
+        # listed the dirs in. Ties are broken by path, so every scan of the tree ranks the same files
+        lowest = ranked[-1][0]
+        ranked = [item for item in ranked if item[0] > lowest]
+        tied_rows = sorted((row for score, row in zip(scores, candidates) if score == lowest), key=table.path)
+        ranked += [(lowest, row) for row in tied_rows[:k - len(ranked)]]
+        return sorted(ranked, key=lambda item: (-item[0], table.path(item[1])))
@@ -0,0 +1,54 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 256  # files unlinked by one task of the pool
+
+# errors holds (row, message) pairs of the files that were not deleted
+DeletionResult = namedtuple('DeletionResult', ['removed_rows', 'removed_size', 'errors'])
+
+
+class DeletionPlan:  # Files selected for deletion, printing the plan is the dry run, nothing is deleted until execute
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = sorted({row for row in rows if not table.is_removed(row)})
+        self.total_size = sum(table.sizes[row] for row in self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def execute(self, stats, workers=8):
+        # Deletes the files and removes them from the aggregates of stats in place, returns a DeletionResult
+        chunks = [self.rows[start:start + CHUNK_SIZE] for start in range(0, len(self.rows), CHUNK_SIZE)]
+        removed_rows = []
+        errors = []
+        # unlink releases the GIL, so the threads keep several unlinks in flight
+        with ThreadPoolExecutor(workers) as pool:
+            for chunk_removed_rows, chunk_errors in pool.map(self.delete_chunk, chunks):
+                removed_rows.extend(chunk_removed_rows)
+                errors.extend(chunk_errors)
+
+        removed_size = sum(self.table.sizes[row] for row in removed_rows)
+        stats.remove_files(removed_rows)
+        stats.directory_tree.sort()
+        return DeletionResult(removed_rows, removed_size, errors)
+
+    def delete_chunk(self, rows):
+        removed_rows = []
+        errors = []
+        for row in rows:
+            path = self.table.paths[row]
+            try:
+                # a file replaced or written to since the scan is not the file the plan was made for
+                file_stats = os.lstat(path)
+                if file_stats.st_size != self.table.sizes[row] or file_stats.st_mtime != self.table.mtimes[row]:
+                    errors.append((row, 'changed since the scan'))
+                    continue
+                os.unlink(path)
+            except FileNotFoundError:   # already removed, it is only dropped from the statistics
+                pass
+            except OSError as error:
+                errors.append((row, error.strerror or str(error)))
+                continue
+            removed_rows.append(row)
+        return removed_rows, errors
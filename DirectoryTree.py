@@ -0,0 +1,98 @@
+import os
+
+
+class Directory:  # rolled up statistics of a directory, its own files and every subdirectory below it
+    __slots__ = ('path', 'count', 'total_size', 'largest_child', 'largest_child_size', 'subdirs')
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.total_size = 0
+        self.largest_child = None  # path of the largest file or subdirectory directly inside this directory
+        self.largest_child_size = -1
+        self.subdirs = []
+
+    def offer_child(self, path, size):
+        if size > self.largest_child_size:
+            self.largest_child = path
+            self.largest_child_size = size
+
+
+class DirectoryTree:  # du style sizes of every scanned directory, filled during the scan and rolled up once after it
+    def __init__(self):
+        self.directories = {}  # path -> Directory
+        self.by_size = []  # directories sorted by total size, largest first, filled by roll_up
+
+    def add_directory(self, path, files):  # files holds the (path, stat result) pairs directly inside path
+        directory = self.directories.get(path)
+        if directory is None:
+            directory = self.directories[path] = Directory(path)
+        for file_path, file_stats in files:
+            directory.count += 1
+            directory.total_size += file_stats.st_size
+            directory.offer_child(file_path, file_stats.st_size)
+
+    def merge(self, other):  # scan workers list disjoint sets of directories
+        self.directories.update(other.directories)
+
+    def roll_up(self):
+        # deepest directories first, so a directory is complete before it is added to its parent
+        for path in sorted(self.directories, key=lambda path: path.count(os.sep), reverse=True):
+            directory = self.directories[path]
+            parent = self.directories.get(os.path.dirname(path))
+            if parent is not None and parent is not directory:
+                parent.count += directory.count
+                parent.total_size += directory.total_size
+                parent.subdirs.append(path)
+                parent.offer_child(path, directory.total_size)
+        self.sort()
+
+    def sort(self):
+        self.by_size = sorted(self.directories.values(), key=lambda directory: directory.total_size, reverse=True)
+
+    # Changes after roll_up, the largest children are only updated when they grow, call sort once they are applied
+
+    def add_to_ancestors(self, path, count, size):  # Adds a file delta to every rolled up directory above path
+        directory_path = os.path.dirname(path)
+        while directory_path in self.directories:
+            directory = self.directories[directory_path]
+            directory.count += count
+            directory.total_size += size
+            if size > 0:
+                child = self.directories.get(path)
+                directory.offer_child(path, size if child is None else child.total_size)
+            path = directory_path
+            directory_path = os.path.dirname(path)
+            if directory_path == path:
+                break
+
+    def add_empty_directory(self, path):
+        if path in self.directories:
+            return
+        self.directories[path] = Directory(path)
+        parent = self.directories.get(os.path.dirname(path))
+        if parent is not None and parent.path != path:
+            parent.subdirs.append(path)
+
+    def remove_subtree(self, path):  # the files below path must already be removed with add_to_ancestors
+        prefix = path + os.sep
+        for directory_path in [directory_path for directory_path in self.directories
+                               if directory_path == path or directory_path.startswith(prefix)]:
+            del self.directories[directory_path]
+        parent = self.directories.get(os.path.dirname(path))
+        if parent is not None and path in parent.subdirs:
+            parent.subdirs.remove(path)
+
+    def largest(self, n):  # top n directories by total size
+        return self.by_size[:n]
+
+    def largest_subdirs(self, directory, n):  # n largest direct subdirectories of a Directory
+        subdirs = [self.directories[path] for path in directory.subdirs]
+        return sorted(subdirs, key=lambda subdir: subdir.total_size, reverse=True)[:n]
+
+    def subtree(self, path):  # Directory of path with its rolled up count and total size, None if not scanned
+        return self.directories.get(os.path.abspath(os.path.expanduser(path)))
+
+    def roots(self):  # directories whose parent was not scanned, normally only the scan root
+        return [directory for path, directory in self.directories.items()
+                if os.path.dirname(path) not in self.directories or os.path.dirname(path) == path]
@@ -0,0 +1,101 @@
+import hashlib
+import mmap
+import os
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+EDGE_SIZE = 4 * 1024  # bytes hashed from the start and from the end of a file in the partial hash stage
+CHUNK_SIZE = 1024 * 1024  # bytes passed to the hash at once in the full hash stage
+
+
+class DuplicateGroup(namedtuple('DuplicateGroup', ['size', 'rows'])):  # rows of files with identical content
+    __slots__ = ()
+
+    @property
+    def reclaimable(self):  # bytes freed by keeping a single copy
+        return self.size * (len(self.rows) - 1)
+
+
+class DuplicateFinder:  # Finds identical files in stages, each stage only looks at the survivors of the previous one
+    def __init__(self, table, workers=4, min_size=1, edge_size=EDGE_SIZE):
+        self.table = table
+        self.workers = workers
+        self.min_size = min_size
+        self.edge_size = edge_size
+        self.hard_links = {}  # row -> (device, inode) of files with more than one link, filled by partial_hash
+
+    def find(self):  # Returns the DuplicateGroups, most reclaimable bytes first
+        groups = self.group_by_size()
+        # hashing releases the GIL, so the reads and the hashes of different files overlap in the threads
+        with ThreadPoolExecutor(self.workers) as pool:
+            groups = self.split(groups, self.partial_hash, pool)
+            groups = self.drop_hard_links(groups)
+            # files up to two edges long were read completely by the partial hash, only the others are read again
+            small_groups = [rows for rows in groups if self.table.sizes[rows[0]] <= 2 * self.edge_size]
+            large_groups = [rows for rows in groups if self.table.sizes[rows[0]] > 2 * self.edge_size]
+            groups = small_groups + self.split(large_groups, self.full_hash, pool)
+
+        duplicate_groups = [DuplicateGroup(self.table.sizes[rows[0]], rows) for rows in groups]
+        return sorted(duplicate_groups, key=lambda group: group.reclaimable, reverse=True)
+
+    def group_by_size(self):  # only files sharing their exact size with another file can be duplicates
+        sizes = self.table.sizes
+        shared_sizes = {size for size, count in Counter(sizes).items() if count > 1 and size >= self.min_size}
+        rows_by_size = defaultdict(list)
+        for row, size in enumerate(sizes):
+            if size in shared_sizes:
+                rows_by_size[size].append(row)
+        return list(rows_by_size.values())
+
+    def split(self, groups, digest, pool):  # Splits every group by digest(row), unreadable files are dropped
+        rows = [row for group in groups for row in group]
+        rows_by_key = defaultdict(list)
+        for row, key in zip(rows, pool.map(digest, rows, chunksize=64)):
+            if key is not None:
+                rows_by_key[key].append(row)
+        return [rows for rows in rows_by_key.values() if len(rows) > 1]
+
+    def drop_hard_links(self, groups):  # hard links share their inode, they are the same file and not copies of it
+        unique_groups = []
+        for rows in groups:
+            inodes = set()
+            unique_rows = []
+            for row in rows:
+                inode = self.hard_links.get(row)
+                if inode is None or inode not in inodes:
+                    inodes.add(inode)
+                    unique_rows.append(row)
+            if len(unique_rows) > 1:
+                unique_groups.append(unique_rows)
+        return unique_groups
+
+    def partial_hash(self, row):
+        size = self.table.sizes[row]
+        try:
+            with open(self.table.paths[row], 'rb', buffering=0) as file:
+                file_stats = os.fstat(file.fileno())
+                if file_stats.st_size != size:  # changed since the scan
+                    return None
+                digest = hashlib.blake2b(file.read(self.edge_size))
+                if size > 2 * self.edge_size:
+                    file.seek(-self.edge_size, os.SEEK_END)
+                    digest.update(file.read(self.edge_size))
+                else:
+                    digest.update(file.read())
+        except OSError:     # No permission or removed since the scan
+            return None
+        if file_stats.st_nlink > 1:
+            self.hard_links[row] = (file_stats.st_dev, file_stats.st_ino)
+        return size, digest.digest()
+
+    def full_hash(self, row):
+        size = self.table.sizes[row]
+        digest = hashlib.blake2b()
+        try:
+            with open(self.table.paths[row], 'rb') as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    for offset in range(0, len(view), CHUNK_SIZE):
+                        digest.update(view[offset:offset + CHUNK_SIZE])
+        except (OSError, ValueError):     # No permission, removed or truncated since the scan
+            return None
+        return size, digest.digest()
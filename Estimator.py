@@ -0,0 +1,168 @@
+import bisect
+import math
+import os
+import random
+import time
+from statistics import NormalDist
+
+from FileTable import name_extension
+from Scanner import Scanner
+from SizeHistogram import SizeHistogram
+
+
+class Totals:  # file count, total size, size per extension and size bins of some files
+    __slots__ = ('num_of_files', 'total_size', 'extension_sizes', 'bin_counts', 'bin_totals')
+
+    def __init__(self, num_of_bins):
+        self.num_of_files = 0
+        self.total_size = 0
+        self.extension_sizes = {}
+        self.bin_counts = [0] * num_of_bins
+        self.bin_totals = [0] * num_of_bins
+
+    def add(self, other, weight=1):
+        self.num_of_files += other.num_of_files * weight
+        self.total_size += other.total_size * weight
+        for extension, size in other.extension_sizes.items():
+            self.extension_sizes[extension] = self.extension_sizes.get(extension, 0) + size * weight
+        for bucket in range(len(self.bin_counts)):
+            self.bin_counts[bucket] += other.bin_counts[bucket] * weight
+            self.bin_totals[bucket] += other.bin_totals[bucket] * weight
+
+    def values(self):  # (key, value) pairs of every quantity, the cumulative bins are quantities of their own
+        yield 'files', self.num_of_files
+        yield 'size', self.total_size
+        for extension, size in self.extension_sizes.items():
+            yield ('extension', extension), size
+        cumulative_count = cumulative_total = 0
+        for bucket, (count, total) in enumerate(zip(self.bin_counts, self.bin_totals)):
+            cumulative_count += count
+            cumulative_total += total
+            yield ('count', bucket), count
+            yield ('total', bucket), total
+            yield ('cumulative count', bucket), cumulative_count
+            yield ('cumulative total', bucket), cumulative_total
+
+
+class Estimator:
+    # Estimates the statistics of a tree without listing all of it (Knuth's estimator): a walk starts at the root,
+    # lists the directory, steps into one of its subdirectories at random and so on down to a leaf. The files
+    # found on the way are weighed by the product of the branching factors above them, which makes every walk
+    # an unbiased estimate of the totals of the whole tree. Walks are independent, the spread of their estimates
+    # gives a confidence interval of the mean. Listings are cached, so the levels near the root are listed once
+    def __init__(self, root_dir, rules=None, size_boundaries=None, relative_error=0.05, confidence=0.95,
+                 min_walks=1000, seed=None):
+        self.scanner = Scanner(root_dir, rules=rules)
+        self.histogram = SizeHistogram(size_boundaries)  # bins of the estimated counts, filled by size_histogram
+        self.relative_error = relative_error  # half width of the intervals of the file count and the total size
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.min_walks = min_walks  # the spread of the first walks says little about heavy tailed sizes
+        self.random = random.Random(seed)
+        self.listings = {}  # path -> (Totals of its own files, subdir paths)
+        self.unlisted_dirs = 1  # dirs seen in a listing but not listed themselves, 0 once the whole tree is listed
+        self.max_size = 0
+        self.num_of_walks = 0
+        self.num_of_stat_calls = 0
+        self.num_of_permission_errors = 0
+        self.sums = {}  # key of Totals.values -> sum of the estimates of the walks
+        self.sums_of_squares = {}
+        self.exact = None  # values of the whole tree once every directory has been listed
+        self.duration = 0
+
+    def run(self, time_budget=None):
+        # Walks until the intervals are narrow enough, the time budget is spent or the whole tree is listed.
+        # Stopping the first time the intervals look narrow enough favors runs of walks that missed the few
+        # large files, so the bound is only checked after min_walks and every doubling of the walks after that
+        start = time.perf_counter()
+        next_check = self.min_walks
+        while self.exact is None:
+            self.walk()
+            self.duration = time.perf_counter() - start
+            if self.num_of_walks >= next_check:
+                if self.is_accurate():
+                    break
+                next_check *= 2
+            if time_budget is not None and self.duration >= time_budget:
+                break
+        return self
+
+    def walk(self):
+        walk_totals = Totals(len(self.histogram.counts))
+        weight = 1
+        path = self.scanner.root_dir
+        while True:
+            totals, subdirs = self.listing(path)
+            walk_totals.add(totals, weight)
+            if not subdirs:
+                break
+            weight *= len(subdirs)
+            path = self.random.choice(subdirs)
+
+        self.num_of_walks += 1
+        for key, value in walk_totals.values():
+            self.sums[key] = self.sums.get(key, 0) + value
+            self.sums_of_squares[key] = self.sums_of_squares.get(key, 0) + value * value
+        if self.unlisted_dirs == 0:
+            exact_totals = Totals(len(self.histogram.counts))
+            for totals, _ in self.listings.values():
+                exact_totals.add(totals)
+            self.exact = dict(exact_totals.values())
+
+    def listing(self, path):
+        listing = self.listings.get(path)
+        if listing is not None:
+            return listing
+        files, subdirs, errors = self.scanner.list_dir(path)
+        self.num_of_stat_calls += len(files)
+        self.num_of_permission_errors += errors
+        self.unlisted_dirs += len(subdirs) - 1
+
+        boundaries = self.histogram.boundaries
+        totals = Totals(len(self.histogram.counts))
+        for file_path, file_stats in files:
+            size = file_stats.st_size
+            extension = name_extension(os.path.basename(file_path))
+            bucket = bisect.bisect_right(boundaries, size)
+            totals.num_of_files += 1
+            totals.total_size += size
+            if extension != '':  # files without an extension are not grouped, as in ScanStats
+                totals.extension_sizes[extension] = totals.extension_sizes.get(extension, 0) + size
+            totals.bin_counts[bucket] += 1
+            totals.bin_totals[bucket] += size
+            self.max_size = max(self.max_size, size)
+        listing = self.listings[path] = (totals, subdirs)
+        return listing
+
+    def estimate(self, key):  # (estimate, half width of its confidence interval) of a key of Totals.values
+        if self.exact is not None:
+            return self.exact.get(key, 0), 0
+        n = self.num_of_walks
+        if n == 0:
+            return 0, math.inf
+        mean = self.sums.get(key, 0) / n
+        if n == 1:
+            return mean, math.inf
+        variance = max(self.sums_of_squares.get(key, 0) - n * mean * mean, 0) / (n - 1)
+        return mean, self.z * math.sqrt(variance / n)
+
+    def is_accurate(self):
+        for key in ('files', 'size'):
+            value, half_width = self.estimate(key)
+            if half_width > self.relative_error * value:
+                return False
+        return True
+
+    def extensions(self):  # extension -> (estimated total size, half width), largest first
+        extensions = [key[1] for key in self.sums if key[0] == 'extension']
+        estimates = {extension: self.estimate(('extension', extension)) for extension in extensions}
+        return dict(sorted(estimates.items(), key=lambda item: item[1][0], reverse=True))
+
+    def bins(self, kind):  # label -> (estimate, half width) for 'count', 'total' and their cumulative kinds
+        return {label: self.estimate((kind, bucket)) for bucket, label in enumerate(self.histogram.labels)}
+
+    def size_histogram(self):  # SizeHistogram of the estimated counts, for the percentiles
+        for bucket in range(len(self.histogram.counts)):
+            self.histogram.counts[bucket] = self.estimate(('count', bucket))[0]
+            self.histogram.totals[bucket] = self.estimate(('total', bucket))[0]
+        self.histogram.max_size = self.max_size
+        return self.histogram
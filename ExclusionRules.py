@@ -0,0 +1,163 @@
+import ctypes
+import hashlib
+import os
+import re
+
+# file systems without files worth analyzing, their mount points are never descended into
+VIRTUAL_FILESYSTEMS = {'proc', 'sysfs', 'devtmpfs', 'devpts', 'cgroup', 'cgroup2', 'securityfs', 'debugfs',
+                       'tracefs', 'pstore', 'bpf', 'mqueue', 'hugetlbfs', 'configfs', 'fusectl', 'binfmt_misc',
+                       'efivarfs', 'nsfs', 'autofs', 'rpc_pipefs'}
+MOUNTS_PATH = '/proc/self/mounts'
+FILE_ATTRIBUTE_HIDDEN = 2
+
+
+class ExclusionRules:
+    # Decides which directory entries a scan visits. The gitignore style globs are compiled into one regex for
+    # the names and one for the paths relative to the root, so an entry costs at most two regex matches, a regex
+    # search and a set lookup. Directories are checked before they are queued, a pruned subtree is never listed
+    def __init__(self, root_dir, patterns=(), regexes=(), hidden=False, one_file_system=False, max_depth=None):
+        self.root_dir = os.path.abspath(os.path.expanduser(root_dir))
+        self.patterns = list(patterns)  # gitignore style: a pattern without / matches names, a trailing / dirs only
+        self.regexes = list(regexes)  # searched in the full path
+        self.hidden = hidden  # skip hidden entries, dot names or the Windows hidden attribute
+        self.one_file_system = one_file_system
+        self.max_depth = max_depth  # depth of the deepest listed directory, the root is 0
+        self.root_prefix_length = len(os.path.join(self.root_dir, ''))
+
+        name_globs = []
+        dir_name_globs = []
+        path_globs = []
+        dir_path_globs = []
+        for pattern in self.patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            if pattern.startswith('!'):
+                raise ValueError('Negated patterns are not supported: ' + pattern)
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            if '/' in pattern:  # anchored to the root like in a .gitignore at the root
+                (dir_path_globs if dir_only else path_globs).append(glob_to_regex(pattern.lstrip('/')))
+            else:
+                (dir_name_globs if dir_only else name_globs).append(glob_to_regex(pattern))
+        if hidden and os.name != 'nt':
+            name_globs.append(r'\.[^/]*')
+
+        self.file_names = compile_alternatives(name_globs)
+        self.dir_names = compile_alternatives(name_globs + dir_name_globs)
+        self.file_paths = compile_alternatives(path_globs)
+        self.dir_paths = compile_alternatives(path_globs + dir_path_globs)
+        self.full_paths = re.compile('|'.join('(?:' + regex + ')' for regex in self.regexes)) if regexes else None
+        self.pruned_mounts, self.root_device = self.find_pruned_mounts()
+
+    def skip_dir(self, path, name):  # True if the directory and everything below it is not visited
+        if self.dir_names is not None and self.dir_names.match(name):
+            return True
+        if self.skip_path(path, self.dir_paths):
+            return True
+        if self.max_depth is not None and self.depth(path) > self.max_depth:
+            return True
+        if path in self.pruned_mounts:
+            return True
+        if self.root_device is not None:  # no mount table, every directory is compared to the root device
+            try:
+                return os.lstat(path).st_dev != self.root_device
+            except OSError:
+                return True
+        return False
+
+    def skip_file(self, path, name):
+        if self.file_names is not None and self.file_names.match(name):
+            return True
+        return self.skip_path(path, self.file_paths)
+
+    def skip_path(self, path, relative_paths):
+        if relative_paths is not None:
+            relative_path = path[self.root_prefix_length:]
+            if os.sep != '/':
+                relative_path = relative_path.replace(os.sep, '/')
+            if relative_paths.match(relative_path):
+                return True
+        if self.full_paths is not None and self.full_paths.search(path):
+            return True
+        if self.hidden and os.name == 'nt':
+            return has_hidden_attribute(path)
+        return False
+
+    def depth(self, path):
+        return path[self.root_prefix_length:].count(os.sep) + 1
+
+    def find_pruned_mounts(self):
+        # Returns the mount points below the root that are not descended into and the device of the root if the
+        # mount table can not be read and --one-file-system has to compare every directory to it
+        try:
+            with open(MOUNTS_PATH) as mounts:
+                lines = mounts.readlines()
+        except OSError:     # not Linux
+            return set(), os.lstat(self.root_dir).st_dev if self.one_file_system else None
+
+        root_device = os.lstat(self.root_dir).st_dev if self.one_file_system else None
+        prefix = os.path.join(self.root_dir, '')
+        pruned_mounts = set()
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 3:
+                continue
+            # spaces and other special characters of the mount point are octal escapes
+            mount_point = re.sub(r'\\([0-7]{3})', lambda match: chr(int(match.group(1), 8)), fields[1])
+            if not mount_point.startswith(prefix):
+                continue
+            if fields[2] in VIRTUAL_FILESYSTEMS:
+                pruned_mounts.add(mount_point)
+            elif self.one_file_system:
+                try:
+                    if os.lstat(mount_point).st_dev != root_device:
+                        pruned_mounts.add(mount_point)
+                except OSError:
+                    pruned_mounts.add(mount_point)
+        return pruned_mounts, None
+
+    def fingerprint(self):  # changes with the rules, an index of a scan with other rules can not be reused
+        rules = repr((self.root_dir, self.patterns, self.regexes, self.hidden, self.one_file_system, self.max_depth))
+        return hashlib.sha1(rules.encode()).hexdigest()
+
+
+def glob_to_regex(glob):  # gitignore glob -> regex, * and ? stop at /, ** crosses directories
+    regex = ''
+    i = 0
+    while i < len(glob):
+        if glob.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif glob.startswith('/**', i) and i + 3 == len(glob):
+            regex += '/.*'
+            i += 3
+        elif glob.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif glob[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif glob[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif glob[i] == '[' and ']' in glob[i + 2:]:
+            end = glob.index(']', i + 2)
+            characters = glob[i + 1:end]
+            regex += '[' + ('^' + characters[1:] if characters.startswith('!') else characters) + ']'
+            i = end + 1
+        else:
+            regex += re.escape(glob[i])
+            i += 1
+    return regex
+
+
+def compile_alternatives(regexes):  # one regex matching the whole string against any of regexes, None if empty
+    if not regexes:
+        return None
+    return re.compile('(?:' + '|'.join(regexes) + r')\Z')
+
+
+def has_hidden_attribute(path):
+    attributes = ctypes.windll.kernel32.GetFileAttributesW(str(path))
+    return attributes != -1 and bool(attributes & FILE_ATTRIBUTE_HIDDEN)
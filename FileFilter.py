@@ -0,0 +1,95 @@
+import fnmatch
+import os
+import time
+
+from FileTable import SECONDS_PER_DAY
+from SizeHistogram import KB, MB, GB, TB
+
+SIZE_UNITS = {'B': 1, 'KB': KB, 'MB': MB, 'GB': GB, 'TB': TB}
+FILTER_HELP = ("conditions separated by spaces, every one must match: ext=.o,.log  size>10MB  size<1GB  "
+               "age>30  age<7 (days)  under=~/build  glob=*.log (a glob with a / is matched against the path)")
+
+
+class FileFilter:  # Selects the rows of a FileTable that match every given condition
+    def __init__(self, extensions=None, min_size=None, max_size=None, min_age_days=None, max_age_days=None,
+                 under=None, glob=None, age_policy='atime'):
+        self.extensions = extensions  # None matches every extension, '' matches files without one
+        self.min_size = min_size  # sizes and ages are exclusive bounds
+        self.max_size = max_size
+        self.min_age_days = min_age_days
+        self.max_age_days = max_age_days
+        self.under = None if under is None else os.path.abspath(os.path.expanduser(under))
+        self.glob = glob
+        self.age_policy = age_policy
+
+    @classmethod
+    def parse(cls, text, age_policy='atime'):  # Builds a filter from FILTER_HELP style text, raises ValueError
+        conditions = {}
+        for condition in text.split():
+            if condition.startswith('ext='):
+                conditions['extensions'] = [extension if extension.startswith('.') or not extension
+                                            else '.' + extension for extension in condition[4:].split(',')]
+            elif condition.startswith('size>'):
+                conditions['min_size'] = parse_size(condition[5:])
+            elif condition.startswith('size<'):
+                conditions['max_size'] = parse_size(condition[5:])
+            elif condition.startswith('age>'):
+                conditions['min_age_days'] = int(condition[4:])
+            elif condition.startswith('age<'):
+                conditions['max_age_days'] = int(condition[4:])
+            elif condition.startswith('under='):
+                conditions['under'] = condition[6:]
+            elif condition.startswith('glob='):
+                conditions['glob'] = condition[5:]
+            else:
+                raise ValueError('Unknown condition ' + condition)
+        if not conditions:
+            raise ValueError('No conditions given')
+        return cls(age_policy=age_policy, **conditions)
+
+    def select(self, table, now=None, rows=None):
+        # Returns the matching rows out of rows, every row of the table by default. Removed rows never match
+        if now is None:
+            now = time.time()
+        if rows is None:
+            rows = range(len(table))
+        if self.extensions is not None:
+            extension_ids = {table.extension_ids_by_name[extension] for extension in self.extensions
+                             if extension in table.extension_ids_by_name}
+            rows = [row for row in rows if table.extension_ids[row] in extension_ids]
+        if self.min_size is not None:
+            rows = [row for row in rows if table.sizes[row] > self.min_size]
+        if self.max_size is not None:
+            rows = [row for row in rows if table.sizes[row] < self.max_size]
+        if self.min_age_days is not None or self.max_age_days is not None:
+            oldest, newest = self.timestamp_range(now)
+            timestamps = table.timestamps(self.age_policy)
+            rows = [row for row in rows if oldest < timestamps[row] <= newest]
+        if self.under is not None:
+            directory_ids = table.directory_ids_under(self.under)
+            rows = [row for row in rows if table.directory_ids[row] in directory_ids]
+        rows = [row for row in rows if not table.is_removed(row)]
+        if self.glob is not None:
+            if os.sep in self.glob:
+                rows = [row for row in rows if fnmatch.fnmatchcase(table.paths[row], self.glob)]
+            else:
+                rows = [row for row in rows if fnmatch.fnmatchcase(table.name(row), self.glob)]
+        return rows
+
+    def timestamp_range(self, now):
+        # (oldest, newest] timestamps of the age range, with the same whole day ages as the cleaner (Cleaner.rank)
+        oldest = float('-inf')
+        newest = float('inf')
+        if self.max_age_days is not None:  # age < max_age_days
+            oldest = now - self.max_age_days * SECONDS_PER_DAY
+        if self.min_age_days is not None:  # age > min_age_days
+            newest = now - (self.min_age_days + 1) * SECONDS_PER_DAY
+        return oldest, newest
+
+
+def parse_size(text):  # 10MB -> 10485760, a number without a unit is in bytes
+    text = text.upper()
+    for unit in ('KB', 'MB', 'GB', 'TB', 'B'):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * SIZE_UNITS[unit])
+    return int(text)
@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+from array import array
+from itertools import repeat
+
+from File import File
+
+SECONDS_PER_DAY = 24 * 60 * 60
+# The age of a file can be measured from its last access, modification or status change time (ctime).
+# Mounts with noatime or relatime do not keep access times up to date, mtime or ctime is more reliable there
+AGE_POLICIES = {'atime': 'atimes', 'mtime': 'mtimes', 'ctime': 'ctimes'}
+REMOVED = 2 ** 32 - 1  # directory id of the removed rows
+# os.fsencode and os.fsdecode without their type checks, names are always str
+FS_ENCODING = sys.getfilesystemencoding()
+FS_ERRORS = sys.getfilesystemencodeerrors()
+
+
+class PathColumn:  # paths[row] view of a FileTable, a path is only built when it is read
+    __slots__ = ('table',)
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, row):  # None for a removed row
+        return self.table.path(row)
+
+    def __iter__(self):
+        return (self.table.path(row) for row in range(len(self.table)))
+
+
+class FileTable:  # column store of the scanned files, a file is a row index instead of a File object
+    def __init__(self):
+        # every directory path is stored once, a file keeps the id of its directory and its name. The names are
+        # the file system encoded bytes of one buffer, a name is a (start, length) slice of it
+        self.directory_paths = []
+        self.directory_ids_by_path = {}
+        self.directory_ids = array('I')
+        self.name_bytes = bytearray()
+        self.name_starts = array('q')
+        self.name_lengths = array('H')
+        self.paths = PathColumn(self)
+        self.sizes = array('q')
+        self.atimes = array('d')
+        self.mtimes = array('d')
+        self.ctimes = array('d')
+        self.extension_ids = array('I')
+        # interned extensions, every extension string is stored once and rows refer to it by its id
+        self.extensions = []
+        self.extension_ids_by_name = {}
+        self.free_rows = []  # rows of removed files, reused by insert
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def add(self, path, file_stats):  # Appends a file from an already made stat call, returns its row
+        row = len(self.sizes)
+        directory_path, name = os.path.split(path)
+        encoded_name = name.encode(FS_ENCODING, FS_ERRORS)
+        self.directory_ids.append(self.directory_id(directory_path))
+        self.name_starts.append(len(self.name_bytes))
+        self.name_lengths.append(len(encoded_name))
+        self.name_bytes += encoded_name
+        self.sizes.append(file_stats.st_size)
+        self.atimes.append(file_stats.st_atime)
+        self.mtimes.append(file_stats.st_mtime)
+        self.ctimes.append(file_stats.st_ctime)
+        self.extension_ids.append(self.extension_id(name_extension(name)))
+        return row
+
+    def add_files(self, directory_path, files, names=None):
+        # Appends the (path, stat result) pairs of the files directly inside directory_path, returns the first row.
+        # A whole directory is appended column by column, its directory id is looked up once. names holds the
+        # names of the files when the caller has them already, e.g. the rows of a ScanIndex, else they are cut
+        # out of the paths
+        first_row = len(self.sizes)
+        if names is None:
+            name_start = len(os.path.join(directory_path, ''))
+            names = [path[name_start:] for path, _ in files]
+        encoded_names = [name.encode(FS_ENCODING, FS_ERRORS) for name in names]
+        name_start = len(self.name_bytes)
+        for encoded_name in encoded_names:
+            self.name_starts.append(name_start)
+            name_start += len(encoded_name)
+        self.name_lengths.extend(map(len, encoded_names))
+        self.name_bytes += b''.join(encoded_names)
+        self.directory_ids.extend(repeat(self.directory_id(directory_path), len(encoded_names)))
+        self.sizes.extend(file_stats.st_size for _, file_stats in files)
+        self.atimes.extend(file_stats.st_atime for _, file_stats in files)
+        self.mtimes.extend(file_stats.st_mtime for _, file_stats in files)
+        self.ctimes.extend(file_stats.st_ctime for _, file_stats in files)
+        self.extension_ids.extend(self.extension_id(name_extension(name)) for name in names)
+        return first_row
+
+    def insert(self, path, file_stats):  # add that reuses the row of a removed file, for changes after the scan
+        if not self.free_rows:
+            return self.add(path, file_stats)
+        row = self.free_rows.pop()
+        directory_path, name = os.path.split(path)
+        encoded_name = name.encode(FS_ENCODING, FS_ERRORS)
+        self.directory_ids[row] = self.directory_id(directory_path)
+        # the old name is left in the buffer, only the rows of this table point into it
+        self.name_starts[row] = len(self.name_bytes)
+        self.name_lengths[row] = len(encoded_name)
+        self.name_bytes += encoded_name
+        self.set_stats(row, file_stats)
+        self.extension_ids[row] = self.extension_id(name_extension(name))
+        return row
+
+    def set_stats(self, row, file_stats):
+        self.sizes[row] = file_stats.st_size
+        self.atimes[row] = file_stats.st_atime
+        self.mtimes[row] = file_stats.st_mtime
+        self.ctimes[row] = file_stats.st_ctime
+
+    def remove(self, row):
+        # a removed row looks like an empty file without an extension, which the cleaner and the duplicate
+        # finder already skip, until insert reuses it
+        self.directory_ids[row] = REMOVED
+        self.sizes[row] = 0
+        self.extension_ids[row] = self.extension_id('')
+        self.free_rows.append(row)
+
+    def is_removed(self, row):
+        return self.directory_ids[row] == REMOVED
+
+    def directory_id(self, directory_path):
+        directory_id = self.directory_ids_by_path.get(directory_path)
+        if directory_id is None:
+            directory_id = len(self.directory_paths)
+            self.directory_paths.append(directory_path)
+            self.directory_ids_by_path[directory_path] = directory_id
+        return directory_id
+
+    def name(self, row):
+        start = self.name_starts[row]
+        return self.name_bytes[start:start + self.name_lengths[row]].decode(FS_ENCODING, FS_ERRORS)
+
+    def path(self, row):  # None for a removed row
+        directory_id = self.directory_ids[row]
+        if directory_id == REMOVED:
+            return None
+        return os.path.join(self.directory_paths[directory_id], self.name(row))
+
+    def directory_ids_under(self, *paths):  # ids of the directories paths and of every directory below them
+        paths = set(paths)
+        prefixes = tuple(os.path.join(path, '') for path in paths)
+        return {directory_id for directory_id, directory_path in enumerate(self.directory_paths)
+                if directory_path in paths or directory_path.startswith(prefixes)}
+
+    def extension_id(self, extension):
+        extension_id = self.extension_ids_by_name.get(extension)
+        if extension_id is None:
+            extension_id = len(self.extensions)
+            self.extensions.append(extension)
+            self.extension_ids_by_name[extension] = extension_id
+        return extension_id
+
+    def extension(self, row):
+        return self.extensions[self.extension_ids[row]]
+
+    def timestamps(self, policy='atime'):  # the column the age of a file is measured from
+        return getattr(self, AGE_POLICIES[policy])
+
+    def age(self, row, policy='atime', now=None):
+        if now is None:
+            now = time.time()
+        return int((now - self.timestamps(policy)[row]) // SECONDS_PER_DAY)
+
+    def file(self, row):  # Row view, only built when a single file is printed or removed
+        return File(self, row)
+
+    def extend(self, other):  # Appends the rows of another table, returns the row offset they are moved by
+        offset = len(self.sizes)
+        extension_id_map = array('I', (self.extension_id(extension) for extension in other.extensions))
+        directory_id_map = array('I', (self.directory_id(path) for path in other.directory_paths))
+        name_offset = len(self.name_bytes)
+
+        self.directory_ids.extend(REMOVED if directory_id == REMOVED else directory_id_map[directory_id]
+                                  for directory_id in other.directory_ids)
+        self.name_bytes += other.name_bytes
+        self.name_starts.extend(start + name_offset for start in other.name_starts)
+        self.name_lengths.extend(other.name_lengths)
+        self.sizes.extend(other.sizes)
+        self.atimes.extend(other.atimes)
+        self.mtimes.extend(other.mtimes)
+        self.ctimes.extend(other.ctimes)
+        self.extension_ids.extend(extension_id_map[extension_id] for extension_id in other.extension_ids)
+        return offset
+
+
+def name_extension(name):
+    # os.path.splitext(name)[1] of a name without directories, without its separator handling. Leading dots
+    # are not extensions, .bashrc has none
+    dot = name.rfind('.')
+    return name[dot:] if dot > 0 and name[:dot].lstrip('.') else ''
@@ -1,11 +1,62 @@
+import heapq
+
+
 class HashableHeap:  # wrapper class for heaps, required for the extension based hashing
-    def __init__(self, extension):
+    def __init__(self, extension, limit=None):
+        # (size, row) min heap, when limit is set only the limit largest files of the extension are kept
         self.heap = []
+        self.limit = limit
+        # running totals cover every file of the extension, including the ones dropped from the heap
+        self.count = 0
         self.total_size = 0
+        self.min_size = None
+        self.max_size = 0
         self.extension = extension
 
     def __hash__(self):
-        hash(self.extension)
+        return hash(self.extension)
 
     def __lt__(self, other):  # Comparator of the heaps by their sizes
         return self.total_size > other.total_size
+
+    def push(self, size, row):
+        self.count += 1
+        self.total_size += size
+        if self.min_size is None or size < self.min_size:
+            self.min_size = size
+        if size > self.max_size:
+            self.max_size = size
+
+        if self.limit is None or len(self.heap) < self.limit:
+            heapq.heappush(self.heap, (size, row))
+        elif size > self.heap[0][0]:  # larger than the smallest kept file, replace it
+            heapq.heapreplace(self.heap, (size, row))
+
+    def remove_many(self, removed):
+        # removed maps the rows of removed files to their sizes, a bounded heap is not refilled from the files it
+        # dropped before, so it keeps the largest of the remaining files it knows. min_size and max_size are
+        # left as bounds
+        self.count -= len(removed)
+        self.total_size -= sum(removed.values())
+        heap = [(size, row) for size, row in self.heap if row not in removed]
+        if len(heap) != len(self.heap):
+            heapq.heapify(heap)
+            self.heap = heap
+
+    def largest(self):  # (size, row) pairs of the kept files, largest first
+        return sorted(self.heap, reverse=True)
+
+    def merge(self, other, row_offset=0):  # Merges the heap of the same extension built by another scan worker
+        self.count += other.count
+        self.total_size += other.total_size
+        if other.min_size is not None and (self.min_size is None or other.min_size < self.min_size):
+            self.min_size = other.min_size
+        self.max_size = max(self.max_size, other.max_size)
+
+        if row_offset:  # the rows of the other worker are appended to this table after row_offset rows
+            self.heap.extend((size, row + row_offset) for size, row in other.heap)
+        else:  # the same rows, or items that are not rows like the paths of a ScanSummary
+            self.heap.extend(other.heap)
+        if self.limit is not None and len(self.heap) > self.limit:
+            self.heap = heapq.nlargest(self.limit, self.heap)
+        heapq.heapify(self.heap)
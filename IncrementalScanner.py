@@ -0,0 +1,65 @@
+import os
+from collections import namedtuple
+
+from Scanner import Scanner
+from ScanStats import ScanStats
+
+# Stands in for the stat result of a directory that could not be listed, its mtime never matches a real one
+UnlistedDirectory = namedtuple('UnlistedDirectory', ['st_ino', 'st_mtime'])
+UNLISTED_MTIME = -1.0
+
+
+class IncrementalScanner(Scanner):  # Re-lists only the directories whose mtime changed since the indexed scan
+    def __init__(self, index, root_dir, workers=1, rules=None, new_stats=ScanStats):
+        super().__init__(root_dir, workers=workers, rules=rules, new_stats=new_stats)
+        self.index = index
+        # every worker records its own directories, the lists are joined after the scan
+        self.unchanged_dirs = [[] for _ in range(self.workers)]
+        # (path, dir stat result, first row, end row) of the listed directories, recorded by the thread that
+        # aggregates the listings. Its table is the only one with rows and comes first, so the rows are kept
+        self.listed_dirs = []
+
+    def scan(self):
+        self.index.load_directories()
+        stats = super().scan()
+
+        visited_paths = {path for paths in self.unchanged_dirs for path in paths}
+        visited_paths.update(listed_dir[0] for listed_dir in self.listed_dirs)
+        self.index.update(self.listed_dirs, visited_paths, stats.table)
+        return stats
+
+    def merge(self, worker_stats):
+        # files of unchanged directories come from the index, they are added like one more worker
+        stored_stats = self.new_worker_stats()
+        self.index.load_files([path for paths in self.unchanged_dirs for path in paths], stored_stats)
+        return super().merge(worker_stats + [stored_stats])
+
+    def scan_dir(self, worker_id, path, stats):
+        stats.num_of_stat_calls += 1
+        try:
+            dir_stats = os.stat(path)
+        except OSError:     # No permission
+            stats.num_of_permission_errors += 1
+            return
+
+        if self.index.is_unchanged(path, dir_stats):
+            self.unchanged_dirs[worker_id].append(path)
+            for subdir in self.index.subdirs.get(self.index.directories[path].id, ()):
+                self.queue_dir(worker_id, subdir)
+            return
+
+        listing = self.list_dir_counted(path, stats)
+        if listing is None:
+            # stored without files and subdirs, but never unchanged, so the next scan lists it again. Dropping it
+            # would not do, the unchanged parent only queues the stored subdirs
+            self.hand_over(stats, path, [], UnlistedDirectory(dir_stats.st_ino, UNLISTED_MTIME))
+            return
+        files, subdirs = listing
+        for subdir in subdirs:
+            self.queue_dir(worker_id, subdir)
+        self.hand_over(stats, path, files, dir_stats)
+
+    def aggregate(self, stats, path, files, dir_stats):
+        first_row = len(stats.table)
+        stats.add_directory(path, files)
+        self.listed_dirs.append((path, dir_stats, first_row, len(stats.table)))
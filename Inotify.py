@@ -0,0 +1,84 @@
+import ctypes
+import errno
+import os
+import select
+import struct
+
+# Event masks from linux/inotify.h
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+# changes of the directory entries and of the files below them
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+              | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len of the name that follows
+READ_SIZE = 64 * 1024
+
+
+class Inotify:  # ctypes binding of the Linux inotify API, one watch per directory
+    def __init__(self, watch_access=False):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.mask = WATCH_MASK | IN_ACCESS if watch_access else WATCH_MASK
+        self.paths_by_wd = {}
+        self.wds_by_path = {}
+
+    def add_watch(self, path):  # Returns False if path can not be watched, e.g. no permission or the watch limit
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.mask)
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOSPC:
+                raise OSError(errno.ENOSPC, 'inotify watch limit reached, raise fs.inotify.max_user_watches')
+            return False
+        self.paths_by_wd[wd] = path
+        self.wds_by_path[path] = wd
+        return True
+
+    def remove_watch(self, path):  # of a directory removed or moved away from the watched tree
+        wd = self.wds_by_path.pop(path, None)
+        if wd is not None:
+            self.paths_by_wd.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)  # fails if the directory is gone, its watch is dropped already
+
+    def read_events(self, timeout=None):
+        # Returns the (directory path, mask, cookie, name) tuples that are ready, waits up to timeout seconds
+        # for the first one. The path of an IN_Q_OVERFLOW event is None
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        events = []
+        while True:
+            try:
+                buffer = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if mask & IN_IGNORED:  # the watch was removed, the directory is gone
+                    path = self.paths_by_wd.pop(wd, None)
+                    if self.wds_by_path.get(path) == wd:
+                        del self.wds_by_path[path]
+                    continue
+                events.append((self.paths_by_wd.get(wd), mask, cookie, name))
+
+    def close(self):
+        os.close(self.fd)
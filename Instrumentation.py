@@ -0,0 +1,101 @@
+import sys
+import threading
+import time
+
+from SizeHistogram import format_size_label
+
+
+class PhaseTimers:  # wall time spent in every phase, every scan worker keeps its own and they are summed by merge
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+
+    def add(self, phase, seconds):
+        self.seconds[phase] = self.seconds.get(phase, 0) + seconds
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def run(self, phase, function, *args):  # Calls function and adds the time it took to phase
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def merge(self, other):
+        for phase, seconds in other.seconds.items():
+            self.seconds[phase] = self.seconds.get(phase, 0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + other.calls[phase]
+
+    def print(self, output=sys.stderr):
+        for phase, seconds in sorted(self.seconds.items(), key=lambda item: item[1], reverse=True):
+            print('%-12s %10.4fs in %d calls' % (phase, seconds, self.calls[phase]), file=output)
+
+
+class ProgressLine:  # Redraws the counters of a running scan on one line, a thread wakes up once every interval
+    def __init__(self, scanner, interval=0.5, expected_size=None, output=sys.stderr):
+        self.scanner = scanner  # the workers' ScanStats are read without a lock, a stale count is good enough here
+        self.interval = interval
+        self.expected_size = expected_size  # bytes the scan is expected to find, the ETA is left out when None
+        self.output = output
+        self.start_time = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.draw()
+        print(file=self.output)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.draw()
+
+    def draw(self):
+        files = dirs = size = 0
+        for stats in list(self.scanner.worker_stats):
+            files += stats.num_of_files_found
+            dirs += stats.num_of_dirs_scanned
+            size += stats.total_size_of_found_files
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+
+        line = '%d files, %d dirs, %s, %d files/sec' % (files, dirs, format_size_label(size), files / elapsed)
+        if self.expected_size and size:
+            remaining_time = max(self.expected_size - size, 0) * elapsed / size  # at the bytes/sec seen so far
+            line += ', ETA %ds' % remaining_time
+        self.output.write('\r' + line.ljust(79))
+        self.output.flush()
+
+
+class Profiler:  # Optional cProfile and tracemalloc hooks, nothing is imported or hooked unless one is requested
+    def __init__(self, profile_path=None, trace_memory=False):
+        self.profile_path = profile_path  # cProfile stats are dumped here, load them with pstats or snakeviz
+        self.trace_memory = trace_memory
+        self.profile = None
+
+    def start(self):
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.profile_path is not None:
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self, output=sys.stderr):
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.profile_path)
+            print('Profile saved to ' + self.profile_path, file=output)
+        if self.trace_memory:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print('Traced memory: ' + format_size_label(current) + ', peak: ' + format_size_label(peak), file=output)
+            for statistic in snapshot.statistics('lineno')[0:10]:
+                print(statistic, file=output)
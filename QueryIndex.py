@@ -0,0 +1,100 @@
+import bisect
+import time
+from array import array
+
+from FileTable import AGE_POLICIES
+
+
+class SortedColumn:  # rows ordered by a column, bisect sees it as the sorted sequence of the column values
+    __slots__ = ('column', 'rows')
+
+    def __init__(self, column, rows=None):  # sorts rows, every row of the column by default
+        self.column = column
+        self.rows = array('I', sorted(range(len(column)) if rows is None else rows, key=column.__getitem__))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.column[self.rows[index]]
+
+    def select(self, low=None, high=None, high_inclusive=False):  # rows with low < value < high (or <= high)
+        start = 0 if low is None else bisect.bisect_right(self, low)
+        if high is None:
+            end = len(self.rows)
+        elif high_inclusive:
+            end = bisect.bisect_right(self, high)
+        else:
+            end = bisect.bisect_left(self, high)
+        return self.rows[start:end]
+
+
+class QueryIndex:
+    # Secondary indexes of a FileTable for FileFilter queries: the rows of every extension sorted by size, the
+    # rows of every directory and every row sorted by size and by the timestamps. Every index is built on its
+    # first use, O(n log n) once, after that a query bisects each indexed condition, starts from the smallest
+    # candidate set and checks the other conditions on it only. Rows added to the table later are not indexed,
+    # build a new QueryIndex after changes
+    def __init__(self, table):
+        self.table = table
+        self.rows_by_extension = None  # extension id -> SortedColumn of the sizes of the extension
+        self.rows_by_directory = None  # directory id -> array of rows
+        self.sorted_columns = {}  # column name -> SortedColumn
+
+    def query(self, file_filter, now=None):  # Returns the rows file_filter.select would return, in no set order
+        if now is None:
+            now = time.time()
+        candidates = None
+        for rows in self.indexed_candidates(file_filter, now):
+            if candidates is None or len(rows) < len(candidates):
+                candidates = rows
+        return file_filter.select(self.table, now, candidates)
+
+    def indexed_candidates(self, file_filter, now):  # a superset of the result per indexed condition
+        if file_filter.extensions is not None:
+            rows_by_extension = self.extension_index()
+            extension_ids = [self.table.extension_ids_by_name[extension] for extension in file_filter.extensions
+                             if extension in self.table.extension_ids_by_name]
+            # the rows of an extension are sorted by size, a size range is a slice of them
+            selected = [rows_by_extension[extension_id].select(file_filter.min_size, file_filter.max_size)
+                        for extension_id in extension_ids if extension_id in rows_by_extension]
+            yield selected[0] if len(selected) == 1 else [row for rows in selected for row in rows]
+        if file_filter.min_size is not None or file_filter.max_size is not None:
+            yield self.sorted_column('sizes').select(file_filter.min_size, file_filter.max_size)
+        if file_filter.min_age_days is not None or file_filter.max_age_days is not None:
+            oldest, newest = file_filter.timestamp_range(now)
+            timestamps = self.sorted_column(AGE_POLICIES[file_filter.age_policy])
+            yield timestamps.select(oldest, newest, high_inclusive=True)
+        if file_filter.under is not None:
+            rows_by_directory = self.directory_index()
+            yield [row for directory_id in self.table.directory_ids_under(file_filter.under)
+                   for row in rows_by_directory.get(directory_id, ())]
+
+    def extension_index(self):
+        if self.rows_by_extension is None:
+            rows_by_extension = {}
+            for row, extension_id in enumerate(self.table.extension_ids):
+                rows = rows_by_extension.get(extension_id)
+                if rows is None:
+                    rows = rows_by_extension[extension_id] = []
+                rows.append(row)
+            sizes = self.table.sizes
+            self.rows_by_extension = {extension_id: SortedColumn(sizes, rows=rows)
+                                      for extension_id, rows in rows_by_extension.items()}
+        return self.rows_by_extension
+
+    def directory_index(self):
+        if self.rows_by_directory is None:
+            self.rows_by_directory = {}
+            for row, directory_id in enumerate(self.table.directory_ids):
+                rows = self.rows_by_directory.get(directory_id)
+                if rows is None:
+                    rows = self.rows_by_directory[directory_id] = array('I')
+                rows.append(row)
+        return self.rows_by_directory
+
+    def sorted_column(self, name):
+        sorted_column = self.sorted_columns.get(name)
+        if sorted_column is None:
+            sorted_column = self.sorted_columns[name] = SortedColumn(getattr(self.table, name))
+        return sorted_column
@@ -0,0 +1,70 @@
+import csv
+import json
+
+# Columns of the CSV report, every record only fills the columns that apply to it
+REPORT_FIELDS = ['record', 'name', 'count', 'total_size', 'min_size', 'max_size', 'duration', 'rank', 'path',
+                 'size', 'age_days', 'priority', 'largest_child', 'largest_child_size', 'directories',
+                 'permission_errors', 'size_range']
+REPORT_FORMATS = ['jsonl', 'csv']
+
+
+class ReportWriter:  # Streams report records as JSON Lines or CSV rows, each record is written as soon as it is given
+    def __init__(self, output, report_format='jsonl'):
+        self.output = output
+        self.csv_writer = None
+        if report_format == 'csv':
+            self.csv_writer = csv.DictWriter(output, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+            self.csv_writer.writeheader()
+
+    def write(self, record):
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(record)
+        else:
+            self.output.write(json.dumps(record) + '\n')
+
+    def write_summary(self, root_dir, stats, duration):
+        self.write({'record': 'summary', 'name': root_dir, 'count': stats.num_of_files_found,
+                    'total_size': stats.total_size_of_found_files, 'duration': duration,
+                    'directories': stats.num_of_dirs_scanned, 'permission_errors': stats.num_of_permission_errors})
+
+    def write_extensions(self, stats):
+        for extension, extension_heap in stats.extension_dictionary.items():
+            self.write({'record': 'extension', 'name': extension, 'count': extension_heap.count,
+                        'total_size': extension_heap.total_size, 'min_size': extension_heap.min_size,
+                        'max_size': extension_heap.max_size})
+
+    def write_size_bins(self, stats):
+        histogram = stats.size_histogram
+        for label, count, total_size in zip(histogram.labels, histogram.counts, histogram.totals):
+            self.write({'record': 'size_bin', 'name': label, 'count': count, 'total_size': total_size})
+
+    def write_age_size_bins(self, stats):  # one record per age and size bin, the age bin is the name
+        for age_label, size_label, count, total_size in stats.age_size_histogram.rows():
+            self.write({'record': 'age_size_bin', 'name': age_label, 'size_range': size_label, 'count': count,
+                        'total_size': total_size})
+
+    def write_directories(self, directories):
+        for directory in directories:
+            self.write({'record': 'directory', 'path': directory.path, 'count': directory.count,
+                        'total_size': directory.total_size, 'largest_child': directory.largest_child,
+                        'largest_child_size': directory.largest_child_size})
+
+    def write_duplicates(self, table, groups):  # one record per copy, the group is its rank
+        for rank, group in enumerate(groups, 1):
+            for row in group.rows:
+                self.write({'record': 'duplicate', 'rank': rank, 'path': table.paths[row], 'size': group.size,
+                            'count': len(group.rows), 'total_size': group.reclaimable})
+
+    def write_files(self, table, rows, age_policy='atime'):  # e.g. the result of a query
+        for row in rows:
+            self.write({'record': 'file', 'path': table.paths[row], 'size': table.sizes[row],
+                        'age_days': table.age(row, age_policy)})
+
+    def write_cleaner_candidates(self, table, ranked, age_policy='atime'):  # ranked holds (priority, row) pairs
+        self.write_cleaner_candidate_records((priority, table.paths[row], table.sizes[row],
+                                              table.age(row, age_policy)) for priority, row in ranked)
+
+    def write_cleaner_candidate_records(self, candidates):  # (priority, path, size, age_days) tuples, e.g. of a summary
+        for rank, (priority, path, size, age_days) in enumerate(candidates, 1):
+            self.write({'record': 'cleaner_candidate', 'rank': rank, 'path': path, 'size': size,
+                        'age_days': age_days, 'priority': priority})
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+from collections import namedtuple, defaultdict
+from itertools import groupby
+
+# Stands in for os.stat_result when files are loaded from the index instead of being stat'ed again
+StoredStat = namedtuple('StoredStat', ['st_size', 'st_atime', 'st_mtime', 'st_ctime'])
+StoredDirectory = namedtuple('StoredDirectory', ['id', 'inode', 'mtime'])
+
+SCHEMA_VERSION = 2  # indexes written with another version are dropped and rebuilt by a full scan
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS directories (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    parent_id INTEGER,
+    inode INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    directory_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    atime REAL NOT NULL,
+    mtime REAL NOT NULL,
+    ctime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_by_directory ON files (directory_id);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+
+class ScanIndex:  # SQLite copy of the last scan, keyed by directory path, inode and mtime
+    def __init__(self, path, rules_fingerprint=''):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.connection.executescript('DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS directories;')
+            self.connection.execute('PRAGMA user_version = ' + str(SCHEMA_VERSION))
+        self.connection.executescript(SCHEMA)
+        # the stored directories were listed with the exclusion rules of the last scan, other rules start over
+        stored_fingerprint = self.connection.execute("SELECT value FROM settings WHERE name = 'rules'").fetchone()
+        if stored_fingerprint is None or stored_fingerprint[0] != rules_fingerprint:
+            with self.connection:
+                self.connection.execute('DELETE FROM files')
+                self.connection.execute('DELETE FROM directories')
+                self.connection.execute("INSERT OR REPLACE INTO settings VALUES ('rules', ?)", (rules_fingerprint,))
+        self.directories = {}  # path -> StoredDirectory
+        self.subdirs = defaultdict(list)  # directory id -> paths of its subdirs at the time of the last scan
+
+    def load_directories(self):
+        self.directories.clear()
+        self.subdirs.clear()
+        rows = self.connection.execute('SELECT id, path, parent_id, inode, mtime FROM directories').fetchall()
+        for directory_id, path, parent_id, inode, mtime in rows:
+            self.directories[path] = StoredDirectory(directory_id, inode, mtime)
+            if parent_id is not None:
+                self.subdirs[parent_id].append(path)
+
+    def is_unchanged(self, path, dir_stats):  # a directory mtime changes when entries are added, removed or renamed
+        directory = self.directories.get(path)
+        return directory is not None and directory.inode == dir_stats.st_ino and directory.mtime == dir_stats.st_mtime
+
+    def load_files(self, directory_paths, stats):  # Adds the stored files of the given directories to stats
+        paths_by_id = {self.directories[path].id: path for path in directory_paths}
+        cursor = self.connection.execute('SELECT directory_id, name, size, atime, mtime, ctime FROM files '
+                                         'ORDER BY directory_id')
+        for directory_id, rows in groupby(cursor, key=lambda row: row[0]):
+            directory_path = paths_by_id.pop(directory_id, None)
+            if directory_path is None:  # re-listed or removed directory
+                continue
+            rows = list(rows)
+            # the stored names go to the table as they are, the paths are only needed by the directory tree
+            stats.add_directory(directory_path, [(os.path.join(directory_path, name),
+                                                  StoredStat(size, atime, mtime, ctime))
+                                                 for _, name, size, atime, mtime, ctime in rows],
+                                [row[1] for row in rows])
+        for directory_path in paths_by_id.values():  # directories without files
+            stats.add_directory(directory_path, [])
+
+    def update(self, listed_dirs, visited_paths, table):
+        # listed_dirs holds (path, dir stat result, first row, end row) of every directory listed by this scan,
+        # its files are the rows in [first row, end row) of table.
+        # Stored directories that were not visited at all do not exist anymore
+        with self.connection:
+            removed_ids = [(directory.id,) for path, directory in self.directories.items()
+                           if path not in visited_paths]
+            self.connection.executemany('DELETE FROM files WHERE directory_id = ?', removed_ids)
+            self.connection.executemany('DELETE FROM directories WHERE id = ?', removed_ids)
+
+            ids_by_path = {path: directory.id for path, directory in self.directories.items()}
+            # parents are listed before their subdirs when sorted by path
+            for path, dir_stats, first_row, end_row in sorted(listed_dirs, key=lambda listed_dir: listed_dir[0]):
+                parent_id = ids_by_path.get(os.path.dirname(path))
+                directory_id = ids_by_path.get(path)
+                if directory_id is None:
+                    directory_id = self.connection.execute(
+                        'INSERT INTO directories (path, parent_id, inode, mtime) VALUES (?, ?, ?, ?)',
+                        (path, parent_id, dir_stats.st_ino, dir_stats.st_mtime)).lastrowid
+                    ids_by_path[path] = directory_id
+                else:
+                    self.connection.execute('UPDATE directories SET parent_id = ?, inode = ?, mtime = ? WHERE id = ?',
+                                            (parent_id, dir_stats.st_ino, dir_stats.st_mtime, directory_id))
+                    self.connection.execute('DELETE FROM files WHERE directory_id = ?', (directory_id,))
+
+                self.connection.executemany(
+                    'INSERT INTO files (directory_id, name, size, atime, mtime, ctime) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(directory_id, table.name(row), table.sizes[row], table.atimes[row],
+                      table.mtimes[row], table.ctimes[row]) for row in range(first_row, end_row)])
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,163 @@
+import time
+
+from AgeSizeHistogram import AgeSizeHistogram
+from DirectoryTree import DirectoryTree
+from FileTable import FileTable, SECONDS_PER_DAY
+from HashableHeap import HashableHeap
+from Instrumentation import PhaseTimers
+from SizeHistogram import SizeHistogram
+
+
+class ScanStats:  # aggregates built by a scan, every scan worker fills its own and they are merged at the end
+    def __init__(self, size_boundaries=None, heap_limit=None, timed=False, age_policy='atime', now=None):
+        self.num_of_files_found = 0
+        self.total_size_of_found_files = 0
+        self.num_of_dirs_scanned = 0
+        self.num_of_stat_calls = 0
+        self.num_of_permission_errors = 0  # directories and files that could not be listed or stat'ed
+        self.timers = PhaseTimers() if timed else None  # None skips the timing of the phases altogether
+        self.table = FileTable()  # every found file is a row of the table
+        # maps the extensions to the heaps of their largest files, heap_limit None keeps every file
+        self.extension_dictionary = {}
+        self.heap_limit = heap_limit
+        # Holds number and total size of files in the size bins, default bins are listed in SizeHistogram
+        self.size_histogram = SizeHistogram(size_boundaries)
+        # the same size bins split by the age of the files, ages are measured from the timestamp of age_policy up to
+        # now, None is the current time. Workers of one scan share now, so their bins are merged as they are
+        self.age_size_histogram = AgeSizeHistogram(size_boundaries, age_policy=age_policy, now=now)
+        self.directory_tree = DirectoryTree()  # count and size of every directory, rolled up by finalize
+        self.version = 0  # changes whenever the aggregates do, views derived from them are rebuilt after that
+
+    def add_directory(self, path, files, names=None):  # Adds the files listed directly inside the directory path
+        self.num_of_dirs_scanned += 1
+        self.directory_tree.add_directory(path, files)
+        self.add_files(path, files, names)
+
+    def add_files(self, directory_path, files, names=None):
+        # Adds the (path, stat result) pairs of the files inside directory_path, the aggregates are fed in batches.
+        # names holds the file names when they are known already, see FileTable.add_files
+        self.version += 1
+        if self.timers is None:
+            first_row = self.table.add_files(directory_path, files, names)
+            self.add_to_heaps(first_row)
+            self.add_to_bins(first_row)
+        else:
+            first_row = self.timers.run('table', self.table.add_files, directory_path, files, names)
+            self.timers.run('heap insert', self.add_to_heaps, first_row)
+            self.timers.run('binning', self.add_to_bins, first_row)
+
+    def add_to_heaps(self, first_row):
+        table = self.table
+        sizes = table.sizes
+        for row in range(first_row, len(table)):
+            self.add_to_dictionary(table.extension(row), sizes[row], row)
+
+    def add_to_bins(self, first_row):
+        sizes = self.table.sizes[first_row:]
+        self.num_of_files_found += len(sizes)
+        self.total_size_of_found_files += sum(sizes)
+        self.size_histogram.add_many(sizes)
+        self.age_size_histogram.add_many(sizes, self.table.timestamps(self.age_size_histogram.age_policy)[first_row:])
+
+    def add_to_age_bins(self, first_row):  # bins the files of the rows from first_row on by age only
+        table = self.table
+        rows = [row for row in range(first_row, len(table)) if not table.is_removed(row)]
+        timestamps = table.timestamps(self.age_size_histogram.age_policy)
+        self.age_size_histogram.add_many([table.sizes[row] for row in rows], [timestamps[row] for row in rows])
+
+    def add_to_dictionary(self, extension, size, row):  # Adds the file to the heap of its extension
+        hashable_heap = self.extension_dictionary.get(extension)
+        if hashable_heap is None:
+            if extension == '':  # files without an extension are not grouped
+                return
+            # if the heap does not exist, create and add with current file
+            hashable_heap = HashableHeap(extension, self.heap_limit)
+            self.extension_dictionary[extension] = hashable_heap
+        hashable_heap.push(size, row)
+
+    # Changes after the scan, used by the watch mode. The directory tree must be rolled up by finalize first
+
+    def insert_file(self, path, file_stats):  # Adds a file created after the scan, returns its row
+        row = self.table.insert(path, file_stats)
+        size = file_stats.st_size
+        self.version += 1
+        self.num_of_files_found += 1
+        self.total_size_of_found_files += size
+        self.size_histogram.add(size)
+        self.age_size_histogram.add(size, self.table.timestamps(self.age_size_histogram.age_policy)[row])
+        self.add_to_dictionary(self.table.extension(row), size, row)
+        self.directory_tree.add_to_ancestors(path, 1, size)
+        return row
+
+    def remove_files(self, rows):  # Removes the files of rows from every aggregate, heaps are filtered once per batch
+        table = self.table
+        self.version += 1
+        removed_by_extension = {}
+        sizes = []
+        timestamps = []
+        age_timestamps = table.timestamps(self.age_size_histogram.age_policy)
+        for row in rows:
+            size = table.sizes[row]
+            sizes.append(size)
+            timestamps.append(age_timestamps[row])
+            removed_by_extension.setdefault(table.extension(row), {})[row] = size
+            self.directory_tree.add_to_ancestors(table.paths[row], -1, -size)
+            table.remove(row)
+
+        self.num_of_files_found -= len(sizes)
+        self.total_size_of_found_files -= sum(sizes)
+        self.size_histogram.remove_many(sizes)
+        self.age_size_histogram.remove_many(sizes, timestamps)
+        for extension, removed in removed_by_extension.items():
+            hashable_heap = self.extension_dictionary.get(extension)
+            if hashable_heap is not None:
+                hashable_heap.remove_many(removed)
+                if hashable_heap.count == 0:
+                    del self.extension_dictionary[extension]
+
+    def refresh_ages(self, now=None):
+        # The age bins are measured against the start of the scan, once they are a day behind now, e.g. in a long
+        # running watch, the files are binned again from the table. Returns the current AgeSizeHistogram
+        if now is None:
+            now = time.time()
+        histogram = self.age_size_histogram
+        if now - histogram.now < SECONDS_PER_DAY:
+            return histogram
+        self.age_size_histogram = AgeSizeHistogram(histogram.size_boundaries, histogram.age_boundaries,
+                                                   histogram.age_policy, now)
+        self.add_to_age_bins(0)
+        return self.age_size_histogram
+
+    def merge(self, other):  # Folds the aggregates of another (worker) scan into this one
+        self.version += 1
+        self.num_of_files_found += other.num_of_files_found
+        self.total_size_of_found_files += other.total_size_of_found_files
+        self.num_of_dirs_scanned += other.num_of_dirs_scanned
+        self.num_of_stat_calls += other.num_of_stat_calls
+        self.num_of_permission_errors += other.num_of_permission_errors
+        if self.timers is not None and other.timers is not None:
+            self.timers.merge(other.timers)
+        row_offset = self.table.extend(other.table)
+
+        for extension, other_heap in other.extension_dictionary.items():
+            if extension not in self.extension_dictionary:
+                self.extension_dictionary[extension] = HashableHeap(extension, self.heap_limit)
+            self.extension_dictionary[extension].merge(other_heap, row_offset)
+
+        self.size_histogram.merge(other.size_histogram)
+        if other.age_size_histogram.now == self.age_size_histogram.now:
+            self.age_size_histogram.merge(other.age_size_histogram)
+        else:  # binned against another now, e.g. the checkpoints of a resumed scan, the rows are binned again
+            self.add_to_age_bins(row_offset)
+        self.directory_tree.merge(other.directory_tree)
+
+    def merge_scan(self, other):  # Folds the finalized scan of another, disjoint root into this finalized one
+        self.merge(other)
+        self.extension_dictionary = dict(sorted(self.extension_dictionary.items()))
+        self.directory_tree.sort()  # both trees are rolled up already, a root is not below another
+
+    def finalize(self):  # Called once every worker is merged
+        # Traversal order differs between runs with workers, fix the order of the extensions
+        self.extension_dictionary = dict(sorted(self.extension_dictionary.items()))
+        self.directory_tree.roll_up()
+
@@ -0,0 +1,187 @@
+import json
+import os
+import socket
+
+from DirectoryTree import Directory
+from HashableHeap import HashableHeap
+from SizeHistogram import SizeHistogram
+
+SUMMARY_VERSION = 1  # summaries written with another version are refused by load
+
+
+class ScanSummary:
+    # Compact, JSON serializable result of a scan: the totals, the extension statistics with their largest files,
+    # the size bins, the top cleaner candidates and the largest directories. A file is kept by path instead of by
+    # row, so summaries of disjoint roots, e.g. shards scanned in separate processes or on other hosts, merge into
+    # the summary of all of them without the tables. Every kept top list is exact after a merge, the top k of a
+    # union is among the top k of its parts
+    def __init__(self, size_boundaries=None, heap_limit=None, age_policy='atime', num_of_candidates=100,
+                 num_of_directories=50):
+        self.roots = []  # (host, path) pairs of the scanned roots
+        self.num_of_files_found = 0
+        self.total_size_of_found_files = 0
+        self.num_of_dirs_scanned = 0
+        self.num_of_stat_calls = 0
+        self.num_of_permission_errors = 0
+        self.duration = 0  # of the longest shard, shards are expected to run at the same time
+        self.extension_dictionary = {}  # extension -> HashableHeap of (size, path) pairs
+        self.heap_limit = heap_limit
+        self.size_histogram = SizeHistogram(size_boundaries)
+        self.age_policy = age_policy  # priorities of candidates ranked by other timestamps do not compare
+        self.cleaner_candidates = []  # (priority, path, size, age_days) tuples, highest priority first
+        self.num_of_candidates = num_of_candidates
+        self.directories = []  # Directory objects of the roots and of the num_of_directories largest directories
+        self.num_of_directories = num_of_directories
+
+    @classmethod
+    def from_scan(cls, stats, root_dirs, duration, ranked, age_policy='atime', num_of_candidates=100,
+                  num_of_directories=50):
+        # ranked holds the (priority, row) pairs of the num_of_candidates top cleaner candidates of Cleaner.rank
+        summary = cls(stats.size_histogram.boundaries, stats.heap_limit, age_policy, num_of_candidates,
+                      num_of_directories)
+        host = socket.gethostname()
+        summary.roots = [(host, os.path.abspath(os.path.expanduser(root_dir))) for root_dir in root_dirs]
+        summary.num_of_files_found = stats.num_of_files_found
+        summary.total_size_of_found_files = stats.total_size_of_found_files
+        summary.num_of_dirs_scanned = stats.num_of_dirs_scanned
+        summary.num_of_stat_calls = stats.num_of_stat_calls
+        summary.num_of_permission_errors = stats.num_of_permission_errors
+        summary.duration = duration
+        table = stats.table
+        for extension, extension_heap in stats.extension_dictionary.items():
+            heap = summary.extension_dictionary[extension] = HashableHeap(extension, stats.heap_limit)
+            heap.count = extension_heap.count
+            heap.total_size = extension_heap.total_size
+            heap.min_size = extension_heap.min_size
+            heap.max_size = extension_heap.max_size
+            heap.heap = [(size, table.paths[row]) for size, row in extension_heap.heap]
+        summary.size_histogram.merge(stats.size_histogram)
+        summary.cleaner_candidates = [(priority, table.paths[row], table.sizes[row], table.age(row, age_policy))
+                                      for priority, row in ranked]
+        directories = stats.directory_tree.largest(num_of_directories)
+        summary.directories = directories + [directory for directory in stats.directory_tree.roots()
+                                             if directory not in directories]
+        return summary
+
+    def merge(self, other):  # Folds the summary of other, disjoint roots into this one, raises ValueError
+        if self.size_histogram.boundaries != other.size_histogram.boundaries:
+            raise ValueError('The summaries have different size bins')
+        if self.age_policy != other.age_policy:
+            raise ValueError('The summaries rank the cleaner candidates by different timestamps')
+        overlap = overlapping_roots(self.roots + other.roots)
+        if overlap is not None:
+            raise ValueError('Overlapping roots ' + format_root(overlap[0]) + ' and ' + format_root(overlap[1]))
+
+        self.roots.extend(other.roots)
+        self.num_of_files_found += other.num_of_files_found
+        self.total_size_of_found_files += other.total_size_of_found_files
+        self.num_of_dirs_scanned += other.num_of_dirs_scanned
+        self.num_of_stat_calls += other.num_of_stat_calls
+        self.num_of_permission_errors += other.num_of_permission_errors
+        self.duration = max(self.duration, other.duration)
+        for extension, other_heap in other.extension_dictionary.items():
+            if extension not in self.extension_dictionary:
+                self.extension_dictionary[extension] = HashableHeap(extension, self.heap_limit)
+            self.extension_dictionary[extension].merge(other_heap)
+        self.extension_dictionary = dict(sorted(self.extension_dictionary.items()))
+        self.size_histogram.merge(other.size_histogram)
+
+        self.num_of_candidates = max(self.num_of_candidates, other.num_of_candidates)
+        # equal priorities go by ascending path, like Cleaner.rank
+        self.cleaner_candidates = sorted(self.cleaner_candidates + other.cleaner_candidates,
+                                         key=lambda candidate: (-candidate[0], candidate[1]))[:self.num_of_candidates]
+        self.num_of_directories = max(self.num_of_directories, other.num_of_directories)
+        root_paths = {path for _, path in self.roots}
+        directories = sorted(self.directories + other.directories, key=lambda directory: directory.total_size,
+                             reverse=True)
+        self.directories = directories[:self.num_of_directories] + [
+            directory for directory in directories[self.num_of_directories:] if directory.path in root_paths]
+
+    def largest_directories(self, n):
+        return sorted(self.directories, key=lambda directory: directory.total_size, reverse=True)[:n]
+
+    def name(self):  # the roots, with their hosts when the summary covers more than one host
+        hosts = {host for host, _ in self.roots}
+        return ', '.join(path if len(hosts) == 1 else format_root((host, path)) for host, path in self.roots)
+
+    def to_dict(self):
+        histogram = self.size_histogram
+        return {
+            'version': SUMMARY_VERSION,
+            'roots': self.roots,
+            'files': self.num_of_files_found,
+            'total_size': self.total_size_of_found_files,
+            'directories': self.num_of_dirs_scanned,
+            'stat_calls': self.num_of_stat_calls,
+            'permission_errors': self.num_of_permission_errors,
+            'duration': self.duration,
+            'heap_limit': self.heap_limit,
+            'extensions': {extension: [heap.count, heap.total_size, heap.min_size, heap.max_size, heap.heap]
+                           for extension, heap in self.extension_dictionary.items()},
+            'size_bins': {'boundaries': histogram.boundaries, 'counts': histogram.counts,
+                          'totals': histogram.totals, 'max_size': histogram.max_size},
+            'age_policy': self.age_policy,
+            'num_of_candidates': self.num_of_candidates,
+            'cleaner_candidates': self.cleaner_candidates,
+            'num_of_directories': self.num_of_directories,
+            'directory_rollups': [[directory.path, directory.count, directory.total_size, directory.largest_child,
+                                   directory.largest_child_size] for directory in self.directories],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != SUMMARY_VERSION:
+            raise ValueError('Unsupported summary version ' + str(data.get('version')))
+        bins = data['size_bins']
+        summary = cls(bins['boundaries'], data['heap_limit'], data['age_policy'], data['num_of_candidates'],
+                      data['num_of_directories'])
+        summary.roots = [tuple(root) for root in data['roots']]
+        summary.num_of_files_found = data['files']
+        summary.total_size_of_found_files = data['total_size']
+        summary.num_of_dirs_scanned = data['directories']
+        summary.num_of_stat_calls = data['stat_calls']
+        summary.num_of_permission_errors = data['permission_errors']
+        summary.duration = data['duration']
+        for extension, (count, total_size, min_size, max_size, largest) in data['extensions'].items():
+            heap = summary.extension_dictionary[extension] = HashableHeap(extension, summary.heap_limit)
+            heap.count = count
+            heap.total_size = total_size
+            heap.min_size = min_size
+            heap.max_size = max_size
+            heap.heap = [tuple(item) for item in largest]  # a list of pairs keeps the heap order
+        summary.size_histogram.counts = bins['counts']
+        summary.size_histogram.totals = bins['totals']
+        summary.size_histogram.max_size = bins['max_size']
+        summary.cleaner_candidates = [tuple(candidate) for candidate in data['cleaner_candidates']]
+        for path, count, total_size, largest_child, largest_child_size in data['directory_rollups']:
+            directory = Directory(path)
+            directory.count = count
+            directory.total_size = total_size
+            directory.largest_child = largest_child
+            directory.largest_child_size = largest_child_size
+            summary.directories.append(directory)
+        return summary
+
+    def save(self, path):  # written next to path and renamed, a reader never sees a half written summary
+        with open(path + '.tmp', 'w') as output:
+            json.dump(self.to_dict(), output, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):  # raises OSError or ValueError
+        with open(path) as summary_file:
+            return cls.from_dict(json.load(summary_file))
+
+
+def overlapping_roots(roots):  # first pair of (host, path) roots where one is or contains the other, None if disjoint
+    for i, (host, path) in enumerate(roots):
+        for other_host, other_path in roots[i + 1:]:
+            if host == other_host and (path == other_path or other_path.startswith(os.path.join(path, ''))
+                                       or path.startswith(os.path.join(other_path, ''))):
+                return (host, path), (other_host, other_path)
+    return None
+
+
+def format_root(root):
+    host, path = root
+    return host + ':' + path
@@ -0,0 +1,175 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from ScanStats import ScanStats
+
+
+class Scanner:  # os.scandir based traversal, optionally spread over worker threads that steal directories
+    def __init__(self, root_dir, workers=1, rules=None, new_stats=ScanStats):
+        self.root_dir = os.path.abspath(os.path.expanduser(root_dir))
+        self.workers = max(1, workers)
+        self.rules = rules  # ExclusionRules deciding which entries are visited, None visits every entry
+        self.new_stats = new_stats  # builds the empty ScanStats of a worker, takes now
+        self.now = time.time()  # ages of every worker are measured against the same time, see new_worker_stats
+        # every worker pops its own dirs from the right (depth first) and steals the oldest dirs of the
+        # others from the left, those are the closest to the root so a single steal brings a large subtree
+        self.queues = [deque() for _ in range(self.workers)]
+        self.pending_dirs = 0  # dirs queued or being listed, the scan is over when this drops to 0
+        self.work_available = threading.Condition()
+        self.worker_stats = []  # ScanStats of every worker while the scan runs, read by ProgressLine
+        # listings of the worker threads, the arguments of aggregate, queued for the thread that called scan. None
+        # when the workers aggregate their own listings: a single worker, or the CheckpointScanner that saves the
+        # statistics of every worker
+        self.listings = None
+
+    def scan(self):
+        worker_stats = [self.new_worker_stats() for _ in range(self.workers)]
+        if self.workers == 1:
+            self.worker_stats = worker_stats
+            self.queue_dir(0, self.root_dir)
+            self.run_workers(worker_stats)
+            return self.merge(worker_stats)
+
+        # Building the table, heaps and bins is pure Python that holds the GIL, a worker doing it is not listing.
+        # The workers only list and count their stat calls and errors, this thread aggregates the listings as they
+        # arrive into statistics of its own, which are merged first
+        stats = self.new_worker_stats()
+        self.worker_stats = [stats] + worker_stats
+        self.listings = queue.SimpleQueue()
+        self.queue_dir(0, self.root_dir)
+        threads = self.start_workers(worker_stats)
+        try:
+            while True:
+                listing = self.listings.get()
+                if listing is None:  # queued by the worker that listed the last dir
+                    break
+                self.aggregate(stats, *listing)
+        finally:
+            self.listings = None
+        for thread in threads:
+            thread.join()
+        return self.merge(self.worker_stats)
+
+    def new_worker_stats(self):  # workers sharing now merge their age bins as they are, see ScanStats.merge
+        return self.new_stats(now=self.now)
+
+    def run_workers(self, worker_stats):  # returns once every queued dir and every dir below them is listed
+        if self.workers == 1:
+            self.work(0, worker_stats[0])
+        else:
+            for thread in self.start_workers(worker_stats):
+                thread.join()
+
+    def start_workers(self, worker_stats):
+        threads = [threading.Thread(target=self.work, args=(i, worker_stats[i]), daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def merge(self, worker_stats):
+        stats = worker_stats[0]
+        for other in worker_stats[1:]:
+            stats.merge(other)
+        stats.finalize()
+        return stats
+
+    def work(self, worker_id, stats):
+        while True:
+            path = self.next_dir(worker_id)
+            if path is None:
+                return
+            try:
+                self.scan_dir(worker_id, path, stats)
+            finally:
+                with self.work_available:
+                    self.pending_dirs -= 1
+                    if self.pending_dirs == 0:
+                        self.work_available.notify_all()
+                        if self.listings is not None:  # every listing is queued before its dir is done
+                            self.listings.put(None)
+
+    def next_dir(self, worker_id):
+        while True:
+            try:
+                return self.queues[worker_id].pop()
+            except IndexError:
+                pass
+            for victim in self.queues:
+                try:
+                    return victim.popleft()
+                except IndexError:
+                    continue
+            with self.work_available:
+                if self.pending_dirs == 0:
+                    return None
+                if not any(self.queues):  # dirs are queued under this lock, so no wake up can be missed
+                    self.work_available.wait()
+
+    def queue_dir(self, worker_id, path):
+        with self.work_available:
+            self.pending_dirs += 1
+            self.queues[worker_id].append(path)
+            self.work_available.notify()
+
+    def scan_dir(self, worker_id, path, stats):
+        files, subdirs = self.list_dir_counted(path, stats) or ([], [])
+        for subdir in subdirs:
+            self.queue_dir(worker_id, subdir)
+        self.hand_over(stats, path, files)
+
+    def hand_over(self, stats, *listing):  # aggregates a listing, or queues it for the thread that aggregates
+        if self.listings is None:
+            self.aggregate(stats, *listing)
+        else:
+            self.listings.put(listing)
+
+    def aggregate(self, stats, path, files):  # adds a listing to stats, only ever called by one thread per stats
+        stats.add_directory(path, files)
+
+    def list_dir_counted(self, path, stats):
+        # (files, subdirs) of list_dir that feeds the stat and permission error counters of stats, None when path
+        # itself could not be listed
+        try:
+            if stats.timers is None:
+                files, subdirs, errors = self.read_dir(path)
+            else:
+                files, subdirs, errors = stats.timers.run('walk', self.read_dir, path)
+        except OSError:     # No permission
+            stats.num_of_permission_errors += 1
+            return None
+        stats.num_of_stat_calls += len(files)
+        stats.num_of_permission_errors += errors
+        return files, subdirs
+
+    def list_dir(self, path):
+        # Returns the (path, stat result) pairs of the files, the paths of the subdirs and the number of entries
+        # that could not be read. DirEntry already knows the entry type, so the only syscall made per file is
+        # the single lstat
+        try:
+            return self.read_dir(path)
+        except OSError:     # No permission
+            return [], [], 1
+
+    def read_dir(self, path):  # list_dir that raises OSError when path itself can not be listed
+        files = []
+        subdirs = []
+        errors = 0
+        rules = self.rules
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        # pruned before it is queued, nothing below it is listed or stat'ed
+                        if rules is None or not rules.skip_dir(entry.path, entry.name):
+                            subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        if rules is None or not rules.skip_file(entry.path, entry.name):
+                            files.append((entry.path, entry.stat(follow_symlinks=False)))
+                    # symbolic links and special files (Socket, FIFO, device file, ...) are skipped
+                except OSError:     # No permission
+                    errors += 1
+        return files, subdirs, errors
@@ -0,0 +1,99 @@
+import bisect
+
+KB = 2 ** 10
+MB = 2 ** 20
+GB = 2 ** 30
+TB = 2 ** 40
+
+# Upper (exclusive) boundaries of the default size bins:
+# 0-1KB, 1-100KB, 100-500KB, 500KB-1MB, 1MB - 5MB, 5MB - 50MB, 50MB-100MB, 100MB-500MB, 500MB-1GB, 1GB-10GB, >10GB
+DEFAULT_BOUNDARIES = [KB, 100 * KB, 500 * KB, MB, 5 * MB, 50 * MB, 100 * MB, 500 * MB, GB, 10 * GB]
+
+
+class SizeHistogram:  # file count and total size per size bucket, a bucket is found by bisecting numeric boundaries
+    def __init__(self, boundaries=None):
+        self.boundaries = sorted(DEFAULT_BOUNDARIES if boundaries is None else boundaries)
+        self.labels = make_labels(self.boundaries)
+        # bucket i holds boundaries[i - 1] <= size < boundaries[i], the last bucket is open ended
+        self.counts = [0] * (len(self.boundaries) + 1)
+        self.totals = [0] * (len(self.boundaries) + 1)
+        self.max_size = 0  # upper end of the open ended bucket for the percentiles
+
+    @classmethod
+    def log_scale(cls, base=2, smallest=KB, largest=TB):  # buckets growing by a factor of base
+        if not base > 1:  # the boundaries would never grow past largest, nan is refused as well
+            raise ValueError('the base of log scale size bins must be larger than 1, got ' + str(base))
+        boundaries = []
+        boundary = smallest
+        while boundary <= largest:
+            boundaries.append(int(boundary))
+            boundary *= base
+        return cls(boundaries)
+
+    def add(self, size):
+        bucket = bisect.bisect_right(self.boundaries, size)
+        self.counts[bucket] += 1
+        self.totals[bucket] += size
+        if size > self.max_size:
+            self.max_size = size
+
+    def add_many(self, sizes):  # bins a batch of sizes, e.g. all files of a directory
+        boundaries = self.boundaries
+        counts = self.counts
+        totals = self.totals
+        for size in sizes:
+            bucket = bisect.bisect_right(boundaries, size)
+            counts[bucket] += 1
+            totals[bucket] += size
+        if sizes:
+            self.max_size = max(self.max_size, max(sizes))
+
+    def remove_many(self, sizes):  # unbins files removed after the scan, max_size is left as an upper bound
+        boundaries = self.boundaries
+        for size in sizes:
+            bucket = bisect.bisect_right(boundaries, size)
+            self.counts[bucket] -= 1
+            self.totals[bucket] -= size
+
+    def merge(self, other):
+        for bucket in range(len(self.counts)):
+            self.counts[bucket] += other.counts[bucket]
+            self.totals[bucket] += other.totals[bucket]
+        self.max_size = max(self.max_size, other.max_size)
+
+    def count_bins(self):  # label -> number of files view of the histogram
+        return dict(zip(self.labels, self.counts))
+
+    def total_size_bins(self):  # label -> total size of files view of the histogram
+        return dict(zip(self.labels, self.totals))
+
+    def percentile(self, percent):  # O(buckets), interpolates linearly inside the bucket the percentile falls in
+        num_of_files = sum(self.counts)
+        if num_of_files == 0:
+            return 0
+        rank = num_of_files * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.boundaries[bucket - 1] if bucket > 0 else 0
+                upper = self.boundaries[bucket] if bucket < len(self.boundaries) else self.max_size
+                return lower + (min(upper, self.max_size) - lower) * (rank - seen) / count
+            seen += count
+        return self.max_size
+
+
+def make_labels(boundaries):
+    labels = []
+    lower = 0
+    for upper in boundaries:
+        labels.append(format_size_label(lower) + '-' + format_size_label(upper))
+        lower = upper
+    labels.append('>' + format_size_label(lower))
+    return labels
+
+
+def format_size_label(size):  # 1024 -> 1KB, sizes are truncated to keep the labels short
+    for unit, label in ((TB, 'TB'), (GB, 'GB'), (MB, 'MB'), (KB, 'KB')):
+        if size >= unit:
+            return ('%g' % round(size / unit, 1)) + label
+    return str(size) + 'B' if size else '0'
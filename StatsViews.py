@@ -0,0 +1,46 @@
+from itertools import accumulate
+
+
+class StatsViews:
+    # Derived views of a ScanStats for the printed distributions and the charts. A view is built on its first use
+    # and kept until ScanStats.version changes, so repeated commands do not sort or sum again. Views are new
+    # objects, building one never changes the statistics, and callers must not change the views they get
+    def __init__(self, stats):
+        self.stats = stats
+        self.version = stats.version
+        self.views = {}  # name -> view built at self.version
+
+    def cached(self, name, build):  # the view called name, built by build() when missing or out of date
+        if self.version != self.stats.version:
+            self.views.clear()
+            self.version = self.stats.version
+        view = self.views.get(name)
+        if view is None:
+            view = self.views[name] = build()
+        return view
+
+    def count_bins(self, percentage=False, cumulative=False):  # label -> number (or %) of files
+        return self.cached(('count bins', percentage, cumulative),
+                           lambda: self.bins(self.stats.size_histogram.counts, self.stats.num_of_files_found,
+                                             percentage, cumulative))
+
+    def total_size_bins(self, percentage=False, cumulative=False):  # label -> total size (or % of it) of files
+        return self.cached(('total size bins', percentage, cumulative),
+                           lambda: self.bins(self.stats.size_histogram.totals, self.stats.total_size_of_found_files,
+                                             percentage, cumulative))
+
+    def bins(self, values, total, percentage, cumulative):
+        if cumulative:
+            values = accumulate(values)
+        if percentage:
+            values = [value * 100 / total if total else 0 for value in values]
+        return dict(zip(self.stats.size_histogram.labels, values))
+
+    def extension_sizes(self):  # (extensions, total sizes in MB), largest first
+        return self.cached('extension sizes', self.sort_extensions)
+
+    def sort_extensions(self):
+        extension_heaps = sorted(self.stats.extension_dictionary.values(), key=lambda heap: heap.total_size,
+                                 reverse=True)
+        return ([heap.extension for heap in extension_heaps],
+                [heap.total_size / 1000000 for heap in extension_heaps])
@@ -0,0 +1,143 @@
+import os
+import stat
+import time
+
+from Inotify import (Inotify, IN_CREATE, IN_DELETE, IN_DELETE_SELF, IN_ISDIR, IN_MOVE_SELF, IN_MOVED_FROM,
+                     IN_MOVED_TO, IN_Q_OVERFLOW)
+from Scanner import Scanner
+
+
+class Watcher:  # Keeps the ScanStats of a finished scan up to date from inotify events, without walking again
+    def __init__(self, stats, root_dir, rules=None, latency=0.2, max_batch_time=2, watch_access=False):
+        self.scanner = Scanner(root_dir, rules=rules)  # lists the directories created after the scan
+        self.latency = latency  # a batch is closed once no event arrived for latency seconds
+        self.max_batch_time = max_batch_time  # or once it has been collected for max_batch_time seconds
+        self.inotify = Inotify(watch_access)  # access events are only needed when ages are measured from atime
+        self.stats = None
+        # rows of the files by the id of their directory in the table and their name, no path is built per file
+        # and the rows below a removed directory are found by its directory ids
+        self.rows_by_directory = {}
+        self.resync(stats)
+
+    def resync(self, stats):  # Starts over from a new scan, e.g. after the kernel dropped events
+        # changes made while the scan ran are only seen once their files change again
+        self.stats = stats
+        table = stats.table
+        self.rows_by_directory = {}
+        for row in range(len(table)):
+            if not table.is_removed(row):
+                self.rows_by_directory.setdefault(table.directory_ids[row], {})[table.name(row)] = row
+        for path in stats.directory_tree.directories:
+            self.inotify.add_watch(path)
+
+    def next_batch(self, timeout=None):  # Waits for events and collects them until they pause, [] on timeout
+        events = self.inotify.read_events(timeout)
+        started = time.monotonic()
+        while events and time.monotonic() - started < self.max_batch_time:
+            more_events = self.inotify.read_events(self.latency)
+            if not more_events:
+                break
+            events.extend(more_events)
+        return events
+
+    def apply(self, events):
+        # Applies a batch of events, returns the number of added, updated and removed files or None if the kernel
+        # dropped events and a new scan is needed. Events are coalesced into the paths they touch, so every path
+        # is checked once per batch however many events it got
+        changed_files = set()
+        created_dirs = set()  # created or moved in, listed
+        removed_dirs = set()  # deleted or moved out, every file below them is removed
+        rules = self.scanner.rules
+        for directory, mask, cookie, name in events:
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if directory is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):  # the parent reports it as well, except for the root
+                removed_dirs.add(directory)
+                continue
+            path = os.path.join(directory, name)
+            if not mask & IN_ISDIR:
+                if rules is None or not rules.skip_file(path, name):
+                    changed_files.add(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                if rules is None or not rules.skip_dir(path, name):
+                    created_dirs.add(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                removed_dirs.add(path)
+
+        # a directory removed and created again in the same batch is removed first and then listed again
+        num_of_removed = self.remove_dirs(removed_dirs) if removed_dirs else 0
+        removed_rows = []
+        new_files = self.list_dirs(created_dirs)
+        num_of_updated = 0
+        for path in changed_files:
+            try:
+                file_stats = os.lstat(path)
+            except OSError:     # removed or no permission
+                file_stats = None
+            row = self.find_row(path)
+            if file_stats is None or not stat.S_ISREG(file_stats.st_mode):
+                if row is not None:
+                    removed_rows.append(self.pop_row(path))
+            elif row is None:
+                new_files[path] = file_stats
+            elif not self.is_unchanged(row, file_stats):
+                removed_rows.append(self.pop_row(path))
+                new_files[path] = file_stats
+                num_of_updated += 1
+
+        self.stats.remove_files(removed_rows)
+        table = self.stats.table
+        for path, file_stats in new_files.items():
+            row = self.stats.insert_file(path, file_stats)
+            self.rows_by_directory.setdefault(table.directory_ids[row], {})[os.path.basename(path)] = row
+        self.stats.directory_tree.sort()
+        num_of_removed += len(removed_rows) - num_of_updated
+        return len(new_files) - num_of_updated, num_of_updated, num_of_removed
+
+    def remove_dirs(self, removed_dirs):  # Returns the number of files removed below the removed directories
+        removed_rows = []
+        for directory_id in self.stats.table.directory_ids_under(*removed_dirs):
+            removed_rows.extend(self.rows_by_directory.pop(directory_id, {}).values())
+        # the files are removed from the directory tree before their directories
+        self.stats.remove_files(removed_rows)
+        for path in removed_dirs:
+            self.stats.directory_tree.remove_subtree(path)
+        prefixes = tuple(path + os.sep for path in removed_dirs)
+        for path in [path for path in self.inotify.wds_by_path if path in removed_dirs or path.startswith(prefixes)]:
+            self.inotify.remove_watch(path)
+        return len(removed_rows)
+
+    def list_dirs(self, created_dirs):  # Watches and lists the created directories, returns their files
+        new_files = {}
+        pending_dirs = list(created_dirs)
+        while pending_dirs:
+            path = pending_dirs.pop()
+            # the watch is added before the listing, so a file created in between is seen by one of them
+            if not self.inotify.add_watch(path):
+                continue
+            self.stats.directory_tree.add_empty_directory(path)
+            files, subdirs, _ = self.scanner.list_dir(path)
+            for file_path, file_stats in files:
+                if self.find_row(file_path) is None:
+                    new_files[file_path] = file_stats
+            pending_dirs.extend(subdirs)
+        return new_files
+
+    def find_row(self, path):  # row of the file at path, None if it is not in the table
+        directory_path, name = os.path.split(path)
+        rows = self.rows_by_directory.get(self.stats.table.directory_ids_by_path.get(directory_path))
+        return None if rows is None else rows.get(name)
+
+    def pop_row(self, path):  # find_row that forgets the row, the file is removed or stored again
+        directory_path, name = os.path.split(path)
+        return self.rows_by_directory[self.stats.table.directory_ids_by_path[directory_path]].pop(name)
+
+    def is_unchanged(self, row, file_stats):
+        table = self.stats.table
+        return (table.sizes[row] == file_stats.st_size and table.mtimes[row] == file_stats.st_mtime
+                and table.ctimes[row] == file_stats.st_ctime and table.atimes[row] == file_stats.st_atime)
+
+    def close(self):
+        self.inotify.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+# Times every stage of a blink scan on a synthetic tree and saves files/sec and peak RSS as JSON,
+# so that two runs (e.g. before and after a change) can be compared with --compare.
+
+import argparse
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from Cleaner import Cleaner
+from FileTable import FileTable
+from ReportWriter import ReportWriter
+from Scanner import Scanner
+from ScanStats import ScanStats
+from SizeHistogram import SizeHistogram
+import synthetic_tree
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+
+def peak_rss_kb():  # peak resident set size of the process so far, None where it is not available
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform.startswith('darwin') else peak  # bytes on MacOS, KB on Linux
+
+
+def walk(root):  # directory listing and the single lstat per file, without any aggregation
+    scanner = Scanner(root)
+    listed_dirs = []  # (path, files) pairs
+    pending_dirs = [scanner.root_dir]
+    while pending_dirs:
+        path = pending_dirs.pop()
+        dir_files, subdirs, _ = scanner.list_dir(path)
+        listed_dirs.append((path, dir_files))
+        pending_dirs.extend(subdirs)
+    return listed_dirs
+
+
+def build_table(listed_dirs):  # appended a directory at a time like the scanner does
+    table = FileTable()
+    for path, files in listed_dirs:
+        table.add_files(path, files)
+    return table
+
+
+def fill_bins(table):
+    histogram = SizeHistogram()
+    histogram.add_many(table.sizes)
+    return histogram
+
+
+def fill_dictionary(table):
+    stats = ScanStats(heap_limit=20)
+    for row in range(len(table)):
+        stats.add_to_dictionary(table.extension(row), table.sizes[row], row)
+    return stats
+
+
+def rank(stats):
+    return Cleaner(stats.table, 30, 80 / 100, 20 / 100, 1 / 100000).rank(20)
+
+
+def export_report(stats):
+    output = io.StringIO()
+    report = ReportWriter(output)
+    report.write_summary('benchmark', stats, 0)
+    report.write_extensions(stats)
+    report.write_size_bins(stats)
+    report.write_age_size_bins(stats)
+    report.write_directories(stats.directory_tree.largest(50))
+    report.write_cleaner_candidates(stats.table, rank(stats))
+    return output
+
+
+def time_stage(function, argument, repeat):  # best of repeat runs
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(argument)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def run_benchmarks(root, repeat, workers):
+    results = {}
+
+    def record(name, seconds, num_of_files):
+        results[name] = {'seconds': seconds, 'files_per_sec': num_of_files / seconds if seconds else None,
+                         'peak_rss_kb': peak_rss_kb()}
+        print('%-12s %9.4fs %12.0f files/sec' % (name, seconds, results[name]['files_per_sec'] or 0),
+              file=sys.stderr)
+
+    seconds, listed_dirs = time_stage(walk, root, repeat)
+    num_of_files = sum(len(files) for _, files in listed_dirs)
+    record('walk', seconds, num_of_files)
+    seconds, table = time_stage(build_table, listed_dirs, repeat)
+    record('file_table', seconds, num_of_files)
+    seconds, _ = time_stage(fill_bins, table, repeat)
+    record('bins', seconds, num_of_files)
+    seconds, _ = time_stage(fill_dictionary, table, repeat)
+    record('dictionary', seconds, num_of_files)
+    del listed_dirs, table
+
+    seconds, stats = time_stage(lambda path: Scanner(path, workers=workers).scan(), root, repeat)
+    record('scan', seconds, num_of_files)
+    seconds, _ = time_stage(rank, stats, repeat)
+    record('ranking', seconds, num_of_files)
+    seconds, _ = time_stage(export_report, stats, repeat)
+    record('report', seconds, num_of_files)
+    return num_of_files, results
+
+
+def compare(results, baseline, tolerance):  # Prints the stages that got slower than the baseline, returns them
+    regressions = []
+    for name, result in results['stages'].items():
+        baseline_result = baseline['stages'].get(name)
+        if not baseline_result or not baseline_result['files_per_sec'] or not result['files_per_sec']:
+            continue
+        ratio = result['files_per_sec'] / baseline_result['files_per_sec']
+        regressed = ratio < 1 - tolerance
+        if regressed:
+            regressions.append(name)
+        print('%-12s %6.2fx of baseline%s' % (name, ratio, '  REGRESSION' if regressed else ''), file=sys.stderr)
+    return regressions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark the stages of a blink scan')
+    parser.add_argument('--tree', help='existing tree to benchmark, by default a synthetic tree is generated')
+    parser.add_argument('--files', type=int, default=100000, help='files in the generated tree (default: %(default)s)')
+    parser.add_argument('--depth', type=int, default=3, help='depth of the generated tree (default: %(default)s)')
+    parser.add_argument('--fan-out', type=int, default=8, help='fan out of the generated tree (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated tree (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the best is kept (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=1, help='workers of the scan stage (default: %(default)s)')
+    parser.add_argument('--output', help='file the JSON results are saved to, default is stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='files/sec drop relative to the baseline reported as a regression (default: %(default)s)')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    with tempfile.TemporaryDirectory(prefix='blink-benchmark-') as temporary_dir:
+        root = arguments.tree
+        if root is None:
+            root = temporary_dir
+            synthetic_tree.generate(root, files=arguments.files, depth=arguments.depth, fan_out=arguments.fan_out,
+                                    seed=arguments.seed)
+        num_of_files, stages = run_benchmarks(root, arguments.repeat, arguments.workers)
+
+    results = {'files': num_of_files, 'tree': arguments.tree or 'synthetic', 'seed': arguments.seed,
+               'depth': arguments.depth, 'fan_out': arguments.fan_out, 'workers': arguments.workers,
+               'python': platform.python_version(), 'platform': platform.platform(), 'time': time.time(),
+               'stages': stages}
+    if arguments.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(arguments.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if arguments.compare is not None:
+        with open(arguments.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare(results, baseline, arguments.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,357 +1,490 @@
 #!/usr/bin/env python3
 
 import getpass
+import math
 import sys
-import ctypes
+import re
 import os
+import shutil
 import time
-import heapq
-from numpy import unicode
-from collections import OrderedDict
+import argparse
 
 # Project files
-from File import File
-from HashableHeap import HashableHeap
-
-# Plotting related stuff
-import matplotlib.pyplot as plt
-import matplotlib
-from matplotlib import cycler
-from matplotlib import colors
-import squarify
+from Scanner import Scanner
+from IncrementalScanner import IncrementalScanner
+from CheckpointScanner import CheckpointScanner
+from Checkpoint import Checkpoint
+from ScanIndex import ScanIndex
+from Cleaner import Cleaner
+from FileTable import AGE_POLICIES
+from DuplicateFinder import DuplicateFinder
+from ReportWriter import ReportWriter, REPORT_FORMATS
+from ScanStats import ScanStats
+from Watcher import Watcher
+from DeletionPlan import DeletionPlan
+from FileFilter import FileFilter, FILTER_HELP, parse_size
+from QueryIndex import QueryIndex
+from ExclusionRules import ExclusionRules
+from Instrumentation import PhaseTimers, ProgressLine, Profiler
+from SizeHistogram import SizeHistogram, format_size_label
+from Estimator import Estimator
+from ScanSummary import ScanSummary, overlapping_roots
+from StatsViews import StatsViews
+from Charts import Chart, CHART_FORMATS, draw_bar, draw_directory_treemap, draw_treemap, render_charts, show_charts
 
 # Constants
-ROOT_DIR = ''
+ROOT_DIRS = []  # Directories to analyze, every root is scanned with its own exclusion rules and the results merged
+WORKERS = 1  # Number of threads that list directories in parallel
+INDEX_PATH = None  # SQLite index of the previous scan, only changed directories are listed again when set
+DEFAULT_INDEX_PATH = os.path.join('~', '.cache', 'blink', 'index.sqlite')
+CHECKPOINT_PATH = None  # Log of the running scan, a killed scan goes on from its last checkpoint with --resume
+DEFAULT_CHECKPOINT_PATH = os.path.join('~', '.cache', 'blink', 'checkpoint.pickle')
+CHECKPOINT_INTERVAL = 60  # Seconds between two checkpoints of a scan
+CHECKPOINT_MAX_OVERHEAD = 5/100  # Share of the scan time spent writing checkpoints at most, big scans write less often
+RESUME = False  # The first scan goes on from the last checkpoint at CHECKPOINT_PATH instead of starting over
+HEAP_LIMIT = 20  # Largest files kept per extension, None keeps every file in the extension heaps
+SIZE_BOUNDARIES = None  # Upper boundaries of the size bins, None uses the default bins of SizeHistogram
 USER_OS = sys.platform
+EXCLUDE_PATTERNS = []  # gitignore style globs of the entries that are not visited, see ExclusionRules
+EXCLUDE_REGEXES = []  # regexes searched in the paths of the entries that are not visited
+SKIP_HIDDEN = True  # hidden files and dirs are not visited
+ONE_FILE_SYSTEM = False  # mount points of other file systems below the root are not descended into
+MAX_DEPTH = None  # depth of the deepest directory that is listed, the root is 0
 NOT_RECENTLY_ACCESSED_THRESHOLD = 30    # Files that have not been accessed in 30 days are not recently accessed
+AGE_POLICY = 'atime'  # Timestamp the age of a file is measured from: atime, mtime or ctime
+REPORT_CLEANER_CANDIDATES = 100  # Number of cleaner candidates written by --report
+DUPLICATE_HASH_WORKERS = 4  # Minimum number of threads that read and hash duplicate candidates
+LARGEST_DIRECTORIES = 50  # Number of directories listed by show_dir_stats and --report
+DELETION_WORKERS = 8  # Minimum number of threads that delete files in parallel
+QUERY_RESULTS = 20  # Number of the largest matching files printed by the query command
+DELETION_PLAN_PATHS = 20  # Number of paths printed by a deletion plan, the rest is only counted
+WATCH_REPORT_INTERVAL = 60  # Seconds between two reports written by --watch, only written after changes
+SHOW_PROGRESS = sys.stderr.isatty()  # Redraw the counters of a running scan on stderr
+CHARTS_DIR = None  # Charts are saved to files in this directory instead of being shown in windows when set
+CHART_FORMAT = 'png'  # File format of the charts saved to CHARTS_DIR: png or svg
+CHART_WORKERS = None  # Processes that draw the charts saved to CHARTS_DIR, None uses one per CPU
+ESTIMATE_TIME_BUDGET = 30  # Seconds --estimate walks at most when the error bound is not met earlier
+ESTIMATE_RELATIVE_ERROR = 5/100  # --estimate stops once the file count and total size are known this closely
+ESTIMATE_CONFIDENCE = 95/100  # Confidence level of the intervals printed by --estimate
 FILE_SIZE_COEFFICIENT = 80/100
 LAST_ACCESS_DATE_COEFFICIENT = 20/100
 NORMALIZATION_RATE = 1/100000
 
-# Plot styles are overridden in adjust_plot_style function, hold a reference to defaults to reset if needed
-IPython_default = ''
-
-num_of_files_found = 0
-total_size_of_found_files = 0
-
-extension_dictionary = {}  # maps the extensions to the corresponding max heaps
-# Holds number of of files in the following size bins:
-# 0-1KB, 1-100KB, 100-500KB, 500KB-1MB, 1MB - 5MB, 5MB - 50MB, 50MB-100MB, 100MB-500MB, 500MB-1GB, 1GB-10GB, >10GB
-count_to_size_bins = {"0-1KB": 0, "1KB-100KB": 0, "100KB-500KB": 0, "500KB-1MB": 0, "1MB-5MB": 0,
-                      "5MB-50MB": 0, "50MB-100MB": 0, "100MB-500MB": 0, "500MB-1GB": 0, "1GB-10GB": 0, ">10GB": 0}
-count_to_size_bins_cumulative = {}
-
-# Holds total size of files in the following size bins:
-# 0-1KB, 1-100KB, 100-500KB, 500KB-1MB, 1MB - 5MB, 5MB - 50MB, 50MB-100MB, 100MB-500MB, 500MB-1GB, 1GB-10GB, >10GB
-total_size_to_size_bins = {"0-1KB": 0, "1KB-100KB": 0, "100KB-500KB": 0,
-                           "500KB-1MB": 0, "1MB-5MB": 0, "5MB-50MB": 0, "50MB-100MB": 0,
-                           "100MB-500MB": 0, "500MB-1GB": 0, "1GB-10GB": 0, ">10GB": 0}
-total_size_to_size_bins_cumulative = {}
-
-not_recently_accessed_files = []  # not recently accessed files is a max heap, depending on file sizes
-top_20_not_recently_accessed = [None] * 21  # index 0 is empty 1..20 holds not recently used files
-
-def find_all_files_and_dirs(root_dir):
-    # root_dir is the parent of all dirs
-    # go through dirs, we use top down approach to ignore hidden dirs with continue
-    for path, dirs, files in os.walk(root_dir, topdown=True):
-        files = [f for f in files if not is_hidden_dir(f)]
-        dirs[:] = [d for d in dirs if not is_hidden_dir(d)]
-        # special dirs is the list of os specific dirs in MacOS, Linux Dist. and Windows
-        if os.path.isdir(path) or os.path.isfile(path):  # Current element is a directory or file
-            add_to_dictionary(files, str(os.path.abspath(path)))  # add the files inside the dir
-            increment_file_count(len(files))  # Increment file count with number of files in dir
-        else:  # It is a special file if its not either file nor dir
-            print('Current element is a special file (Socket, FIFO, device file, ...)')
+scan_stats = ScanStats()  # file count, total size, extension heaps and size bins of the last scan
+# sorted extensions, size bin and percentage views of scan_stats, built by get_stats_views and kept until it changes
+stats_views = None
+
+# index 0 is empty, 1.. holds the rows offered for deletion by run_cleaner or find_duplicates
+cleaner_candidates = [None]
+
+# rules of the last scan, the watch mode applies them to the new entries as well
+exclusion_rules = None
+
+# indexes of scan_stats.table for queries, built by get_query_index on the first query after a scan or a deletion
+query_index = None
+
+# time spent in every phase when --timings is given, None skips the timing altogether
+phase_timers = None
+
+def find_all_files_and_dirs(root_dirs):
+    # the roots are scanned one after the other, their statistics are merged into scan_stats
+    global scan_stats, query_index
+    query_index = None
+    stats = None
+    for root_dir in root_dirs:
+        root_stats = scan_root(root_dir)
+        if stats is None:
+            stats = root_stats
+        else:
+            stats.merge_scan(root_stats)
+    scan_stats = stats
+
+    if phase_timers is not None:
+        phase_timers.merge(scan_stats.timers)  # summed over the workers, so they can add up to more than the scan
+
+
+def scan_root(root_dir):
+    # root_dir is the parent of all dirs, the excluded dirs are never descended into
+    global exclusion_rules, RESUME
+    exclusion_rules = ExclusionRules(root_dir, EXCLUDE_PATTERNS, EXCLUDE_REGEXES, hidden=SKIP_HIDDEN,
+                                     one_file_system=ONE_FILE_SYSTEM, max_depth=MAX_DEPTH)
+    index = None
+    if CHECKPOINT_PATH is not None:
+        checkpoint = Checkpoint(os.path.expanduser(CHECKPOINT_PATH),
+                                repr((exclusion_rules.fingerprint(), SIZE_BOUNDARIES, HEAP_LIMIT, AGE_POLICY)))
+        scanner = CheckpointScanner(checkpoint, root_dir, workers=WORKERS, rules=exclusion_rules,
+                                    new_stats=new_scan_stats, interval=CHECKPOINT_INTERVAL,
+                                    max_overhead=CHECKPOINT_MAX_OVERHEAD)
+        if RESUME:
+            resume_scan(scanner)
+            RESUME = False  # scans after the first one, e.g. of --watch, start over
+    elif INDEX_PATH is None:
+        scanner = Scanner(root_dir, workers=WORKERS, rules=exclusion_rules, new_stats=new_scan_stats)
+    else:
+        index = ScanIndex(os.path.expanduser(INDEX_PATH), exclusion_rules.fingerprint())
+        scanner = IncrementalScanner(index, root_dir, workers=WORKERS, rules=exclusion_rules,
+                                     new_stats=new_scan_stats)
+
+    progress = None
+    if SHOW_PROGRESS:
+        progress = ProgressLine(scanner, expected_size=expected_scan_size(scanner.root_dir))
+        progress.start()
+    try:
+        return scanner.scan()
+    finally:
+        if progress is not None:
+            progress.stop()
+        if index is not None:
+            index.close()
+        if CHECKPOINT_PATH is not None and scanner.checkpoint_error is not None:
+            print('Checkpoints stopped after an error: ' + str(scanner.checkpoint_error), file=sys.stderr)
+
+
+def resume_scan(scanner):
+    try:
+        scanner.load()
+    except (OSError, ValueError) as error:
+        sys.exit('blink.py: error: --resume ' + CHECKPOINT_PATH + ': ' + str(error))
+    if scanner.resumed_dirs is None:
+        print('No checkpoint was written yet, starting over', file=sys.stderr)
+    else:
+        saved_stats = scanner.saved_stats
+        print('Resuming the scan started ' + time.ctime(scanner.checkpoint.started) + ' after '
+              + str(saved_stats.num_of_dirs_scanned) + ' dirs and '
+              + str(saved_stats.num_of_files_found) + ' files, ' + str(len(scanner.resumed_dirs))
+              + ' dirs left to list', file=sys.stderr)
+
+
+def new_scan_stats(now=None):
+    return ScanStats(size_boundaries=SIZE_BOUNDARIES, heap_limit=HEAP_LIMIT, timed=phase_timers is not None,
+                     age_policy=AGE_POLICY, now=now)
+
+
+def expected_scan_size(root_dir):  # the used space is only known when a whole file system is scanned
+    if not os.path.ismount(root_dir):
+        return None
+    return shutil.disk_usage(root_dir).used
+
+
+def timed(phase, function, *args):  # Calls function, its time is added to phase when --timings is given
+    if phase_timers is None:
+        return function(*args)
+    return phase_timers.run(phase, function, *args)
+
+
+def print_scan_counters(output=sys.stdout):
+    print('Directories: ' + str(scan_stats.num_of_dirs_scanned) + ', stat calls: '
+          + str(scan_stats.num_of_stat_calls) + ', permission errors: '
+          + str(scan_stats.num_of_permission_errors), file=output)
+
+
+def print_phase_timers(output=sys.stdout):
+    if phase_timers is not None:
+        print('*** Time spent in each phase ***', file=output)
+        phase_timers.print(output)
 
 
 def print_all_files():
     print('*** Printing all files ***')
-    for key, extension_heap in extension_dictionary.items():    # go through dictionary, printing each heap
+    for key, extension_heap in scan_stats.extension_dictionary.items():    # go through dictionary, printing each heap
         print('--- Printing ' + key + ' items' + ' total size is: ' + str(extension_heap.total_size) + ' ---')
         print_heap(extension_heap)
 
 
 def print_heap(extension_heap):
-    for item in extension_heap.heap:
+    for _, row in extension_heap.largest():
+        item = scan_stats.table.file(row)
         print(item.path + ' size:' + str(item.size) + ' Time since last access: ' + str(
               str(item.time_since_last_access) + ' days'))
 
 
-def print_size_ext_pairs():
-    for key, extension_heap in extension_dictionary.items():
-        print(key + ' - ' + 'Total size: ' + format_bytes(extension_heap.total_size))
-
-
-def increment_file_count(amount):
-    global num_of_files_found
-    num_of_files_found += amount
+def print_largest_directories(n):
+    print('Printing the ' + str(n) + ' largest directories')
+    for directory in scan_stats.directory_tree.largest(n):
+        print(directory.path + ' - Total size: ' + format_bytes(directory.total_size) + ', '
+              + str(directory.count) + ' files, largest child: ' + str(directory.largest_child))
 
 
-def add_to_dictionary(directory, abs_path):  # Creates a file obj from path and adds to heap
-    for file in directory:
-        try:
-            f = File(os.path.join(abs_path, file))
-            # check the size and increment the frequency here
-            add_to_bins(f)
-            if f.extension in extension_dictionary.keys():  # check if the corresponding heap exists for extension x
-                hashable_heap = extension_dictionary[f.extension]
-                hashable_heap.total_size += f.size
-                heapq.heappush(hashable_heap.heap, f)
-            elif f.extension != '':  # if the heap does not exist, create and add with current file
-                new_heap = HashableHeap(f.extension)
-                new_heap.total_size = f.size
-                extension_dictionary[f.extension] = new_heap
-                heapq.heappush(extension_dictionary[f.extension].heap, f)
-        except OSError:     # No permission
-            pass
-
-
-# Holds total size of files in the following size bins:
-# 0-1KB, 1-100KB, 100-500KB, 500KB-1MB, 1MB - 5MB, 5MB - 50MB, 50MB-100MB, 100MB-500MB, 500MB-1GB, 1GB-10GB, >10GB
-def add_to_bins(file):
-    global total_size_of_found_files
-
-    size_formatted = format_bytes(file.size)
-    split = size_formatted.split()
-    size = float(split[0])
-    magnitude = split[1]
-    total_size_of_found_files += file.size
-
-    if magnitude[0:4] == "byte":
-        total_size_to_size_bins["0-1KB"] += file.size
-        count_to_size_bins["0-1KB"] += 1
-    elif magnitude[0:4] == "Kilo":
-        if int(size) < 100:
-            total_size_to_size_bins["1KB-100KB"] += file.size
-            count_to_size_bins["1KB-100KB"] += 1
-        elif int(size) < 500:
-            total_size_to_size_bins["100KB-500KB"] += file.size
-            count_to_size_bins["100KB-500KB"] += 1
-        else:
-            total_size_to_size_bins["500KB-1MB"] += file.size
-            count_to_size_bins["500KB-1MB"] += 1
-    elif magnitude[0:4] == "Mega":
-        if size < 5:
-            total_size_to_size_bins["1MB-5MB"] += file.size
-            count_to_size_bins["1MB-5MB"] += 1
-        elif size < 50:
-            total_size_to_size_bins["5MB-50MB"] += file.size
-            count_to_size_bins["5MB-50MB"] += 1
-        elif size < 100:
-            total_size_to_size_bins["50MB-100MB"] += file.size
-            count_to_size_bins["50MB-100MB"] += 1
-        elif size < 500:
-            total_size_to_size_bins["100MB-500MB"] += file.size
-            count_to_size_bins["100MB-500MB"] += 1
+def prompt_subtree():  # du style size of any scanned directory, looked up in the rolled up directory tree
+    path = input("Type a directory to see the size of everything below it, or type 'r' to return\n")
+    while path != 'r':
+        directory = scan_stats.directory_tree.subtree(path)
+        if directory is None:
+            print(path + ' was not scanned')
         else:
-            total_size_to_size_bins["500MB-1GB"] += file.size
-            count_to_size_bins["500MB-1GB"] += 1
-    elif magnitude[0:4] == "Giga":
-        if size < 10:
-            total_size_to_size_bins["1GB-10GB"] += file.size
-            count_to_size_bins["1GB-10GB"] += 1
-        else:
-            total_size_to_size_bins[">10GB"] += file.size
-            count_to_size_bins[">10GB"] += 1
-
-
-def convert_bins_to_percentage():
-    for key, value in count_to_size_bins.items():
-        count_to_size_bins[key] = (value * 100) / num_of_files_found
-
-    for key, value in total_size_to_size_bins.items():
-        total_size_to_size_bins[key] = (value * 100) / total_size_of_found_files
-
+            print(directory.path + ' - Total size: ' + format_bytes(directory.total_size) + ', '
+                  + str(directory.count) + ' files, largest child: ' + str(directory.largest_child))
+        path = input("Type another directory, or type 'r' to return\n")
 
-def fill_cumulative_bins():
-    global count_to_size_bins_cumulative
-    global total_size_to_size_bins_cumulative
 
-    count_to_size_bins_cumulative = OrderedDict(count_to_size_bins)
-    total_size_to_size_bins_cumulative = OrderedDict(total_size_to_size_bins)
+def print_size_ext_pairs():
+    for key, extension_heap in scan_stats.extension_dictionary.items():
+        print(key + ' - ' + 'Total size: ' + format_bytes(extension_heap.total_size))
 
-    previous = 0
-    for key, value in count_to_size_bins_cumulative.items():
-        count_to_size_bins_cumulative[key] = value + previous
-        previous = count_to_size_bins_cumulative[key]
 
-    previous = 0
-    for key, value in total_size_to_size_bins_cumulative.items():
-        total_size_to_size_bins_cumulative[key] = value + previous
-        previous = total_size_to_size_bins_cumulative[key]
+def get_stats_views():
+    global stats_views
+    if stats_views is None or stats_views.stats is not scan_stats:
+        stats_views = StatsViews(scan_stats)
+    return stats_views
 
 
 def print_distributions():
+    views = get_stats_views()
     print('Printing number of files among size ranges')
-    for key, value in count_to_size_bins.items():
+    for key, value in views.count_bins().items():
         print(key + ': ' + str(value) + ' files')
 
     print('Printing number of files among size ranges (Cumulative)')
-    for key, value in count_to_size_bins_cumulative.items():
+    for key, value in views.count_bins(cumulative=True).items():
         print(key + ': ' + str(value) + ' files')
 
     print('Printing the total sizes of size bins')
-    for key, value in total_size_to_size_bins.items():
+    for key, value in views.total_size_bins().items():
         print(key + ', Total size: ' + format_bytes(value))
 
     print('Printing the total sizes of size bins (Cumulative)')
-    for key, value in total_size_to_size_bins_cumulative.items():
+    for key, value in views.total_size_bins(cumulative=True).items():
         print(key + ', Total size: ' + format_bytes(value))
 
+    print('Printing the file size percentiles')
+    for percent in (50, 90, 99):
+        print('p' + str(percent) + ': ' + format_bytes(scan_stats.size_histogram.percentile(percent)))
+
 
 def print_distributions_percentage():
+    views = get_stats_views()
     print('Printing the percentages')
 
-    for key, value in count_to_size_bins.items():
+    for key, value in views.count_bins(percentage=True).items():
         print(key + ': ' + str(round(value, 2)) + '%')
 
-    for key, value in count_to_size_bins_cumulative.items():
+    for key, value in views.count_bins(percentage=True, cumulative=True).items():
         print(key + ': ' + str(round(value, 2)) + '%')
 
-    for key, value in total_size_to_size_bins.items():
+    for key, value in views.total_size_bins(percentage=True).items():
         print(key + ', Total size: ' + str(round(value, 2)) + '%')
 
-    for key, value in total_size_to_size_bins_cumulative.items():
+    for key, value in views.total_size_bins(percentage=True, cumulative=True).items():
         print(key + ', Total size: ' + str(round(value, 2)) + '%')
 
 
-def find_not_recently_accessed_files():
-    print('Finding not recently accessed files...')
-    for key, extension_heap in extension_dictionary.items():    # go through dictionary, printing each heap
-        find_not_recently_accessed_file_in_heap(extension_heap)
-
-
-def find_not_recently_accessed_file_in_heap(extension_heap):
-    for file in extension_heap.heap:
-        days_since_last_access = file.time_since_last_access
-
-        if days_since_last_access is not None:  # fill not recently used files heap
-            if days_since_last_access > NOT_RECENTLY_ACCESSED_THRESHOLD:
-                heapq.heappush(not_recently_accessed_files, file)
+def print_age_size_bins():  # total size per size (rows) and age (columns) bin, then the totals above every age
+    histogram = scan_stats.refresh_ages()
+    print('Printing the total sizes of size and age (' + histogram.age_policy + ') bins, ages as of '
+          + time.ctime(histogram.now))
+    print(''.ljust(12) + ''.join(label.rjust(10) for label in histogram.age_labels))
+    totals = {(age_label, size_label): total_size for age_label, size_label, _, total_size in histogram.rows()}
+    for size_label in histogram.size_labels:
+        print(size_label.ljust(12) + ''.join(format_size_label(totals[age_label, size_label]).rjust(10)
+                                             for age_label in histogram.age_labels))
 
+    for days in histogram.age_boundaries:
+        count, total_size = histogram.older_than(days)
+        print('Older than ' + str(days) + ' days: ' + str(count) + ' files, ' + format_bytes(total_size))
 
-def fill_top_20_not_recently_accessed():
-    for i in range(1, 21):
-        file = heapq.heappop(not_recently_accessed_files)
-        top_20_not_recently_accessed[i] = file
 
-
-def set_default_root_dir():
-    global ROOT_DIR
-
-    if USER_OS.startswith('darwin'):  # darwin is MacOS X
-        ROOT_DIR = '/Users/' + getpass.getuser()
-    elif USER_OS.startswith('linux'):
-        ROOT_DIR = '~'
-    elif user_os_is_windows():
-        ROOT_DIR = 'C:\\'  # @TODO: find the user files dir in Windows and use it instead to exclude os files
+def prompt_age_query():  # answered from the age and size bins, no file is read
+    histogram = scan_stats.refresh_ages()
+    text = input("Type an age in days and optionally a minimum size, e.g. '90 10MB', or type 'r' to return\n")
+    while text != 'r':
+        try:
+            fields = text.split()
+            if not 1 <= len(fields) <= 2:
+                raise ValueError('Expected an age and a size')
+            days = int(fields[0])
+            min_size = parse_size(fields[1]) if len(fields) == 2 else 0
+        except ValueError as error:
+            text = input(str(error) + ", try again, 'r' to return\n")
+            continue
+        count, total_size = histogram.older_than(days, min_size)
+        print(str(count) + ' files with total size of ' + format_bytes(total_size) + ' are older than ' + str(days)
+              + ' days and at least ' + format_bytes(min_size) + ' large (interpolated inside the bins)')
+        text = input("Type another age and size, or type 'r' to return\n")
+
+
+def estimate(time_budget):
+    # sampling mode: the extension and size bin statistics of random walks through the tree, extrapolated to the
+    # whole tree with confidence intervals instead of a full scan
+    root_dir = ROOT_DIRS[0]
+    print('Estimating the statistics of ' + root_dir + ' in at most ' + str(time_budget) + 's...')
+    rules = ExclusionRules(root_dir, EXCLUDE_PATTERNS, EXCLUDE_REGEXES, hidden=SKIP_HIDDEN,
+                           one_file_system=ONE_FILE_SYSTEM, max_depth=MAX_DEPTH)
+    estimator = Estimator(root_dir, rules, SIZE_BOUNDARIES, ESTIMATE_RELATIVE_ERROR, ESTIMATE_CONFIDENCE)
+    timed('estimate', estimator.run, time_budget)
+    print('Estimation duration: ' + str(estimator.duration) + ', ' + str(estimator.num_of_walks) + ' walks, '
+          + str(len(estimator.listings)) + ' directories listed, stat calls: ' + str(estimator.num_of_stat_calls)
+          + ', permission errors: ' + str(estimator.num_of_permission_errors))
+    if estimator.exact is not None:
+        print('Every directory was listed, the numbers are exact')
     else:
-        print('Your OS is not supported')
-
-
-def set_custom_root_dir(path):
-    global ROOT_DIR
-    ROOT_DIR = path
+        print('Intervals have ' + str(round(ESTIMATE_CONFIDENCE * 100)) + '% confidence'
+              + ('' if estimator.is_accurate() else ', the time budget ran out before the error bound was met'))
+    print('Number of files found: ' + format_estimate(estimator.estimate('files'), format_count)
+          + ' with total size of: ' + format_estimate(estimator.estimate('size')))
+    print_estimated_size_ext_pairs(estimator)
+    print_estimated_distributions(estimator)
+    print_phase_timers()
 
 
-def print_file(file_name):
-    print('File: ' + file_name)
-
+def print_estimated_size_ext_pairs(estimator):
+    for key, size in estimator.extensions().items():
+        print(key + ' - ' + 'Total size: ' + format_estimate(size))
 
-def is_hidden_dir(file_path):
-    name = set_name(file_path)
 
-    if USER_OS.startswith('win32' or 'nt'):
-        return has_hidden_attribute(file_path)
-    else:
-        return name.startswith('.')
+def print_estimated_distributions(estimator):
+    print('Printing number of files among size ranges')
+    for key, value in estimator.bins('count').items():
+        print(key + ': ' + format_estimate(value, format_count) + ' files')
 
+    print('Printing number of files among size ranges (Cumulative)')
+    for key, value in estimator.bins('cumulative count').items():
+        print(key + ': ' + format_estimate(value, format_count) + ' files')
 
-def set_name(file_path):
-    split = file_path.split('\\') \
-        if user_os_is_windows() else file_path.split('/')
+    print('Printing the total sizes of size bins')
+    for key, value in estimator.bins('total').items():
+        print(key + ', Total size: ' + format_estimate(value))
 
-    name = split[-1]  # take the last item
-    return name
+    print('Printing the total sizes of size bins (Cumulative)')
+    for key, value in estimator.bins('cumulative total').items():
+        print(key + ', Total size: ' + format_estimate(value))
 
+    print('Printing the file size percentiles')
+    size_histogram = estimator.size_histogram()
+    for percent in (50, 90, 99):
+        print('p' + str(percent) + ': ' + format_bytes(round(size_histogram.percentile(percent))))
 
-def user_os_is_windows():
-    return USER_OS.startswith('win32' or 'nt')
 
+def format_estimate(estimate, format_value=None):  # (value, half width) -> '12 ± 3', sizes by default
+    format_value = format_value or (lambda size: format_bytes(round(size)))
+    value, half_width = estimate
+    if half_width == 0:
+        return format_value(value)
+    if math.isinf(half_width):  # a single walk has no spread
+        return format_value(value) + ' ± ?'
+    return format_value(value) + ' ± ' + format_value(half_width)
 
-def has_hidden_attribute(filepath):
-    try:
-        attributes = ctypes.windll.kernel32.GetFileAttributesW(unicode(filepath))
-        assert attributes != -1
-    except (AttributeError, AssertionError):
-        result = False
-        return result
 
+def format_count(count):
+    return str(round(count))
 
-def adjust_plot_style():
-    global IPython_default  # reference to the global var.
-    IPython_default = plt.rcParams.copy()  # copy the default plot settings
 
-    colors = cycler('color',
-                    ['#EE6666', '#3388BB', '#9988DD',
-                     '#EECC55', '#88BB44', '#FFBBBB'])
-    plt.rc('axes', facecolor='#E6E6E6', edgecolor='none',
-           axisbelow=True, grid=True, prop_cycle=colors)
-    plt.rc('grid', color='w', linestyle='solid')
-    plt.rc('xtick', direction='out', color='gray')
-    plt.rc('ytick', direction='out', color='gray')
-    plt.rc('patch', edgecolor='#E6E6E6')
-    plt.rc('lines', linewidth=2)
+def fill_cleaner_with_not_recently_accessed():
+    # ranks the not recently accessed files from scratch, running the cleaner again gives the same list
+    # the not recently accessed files ordered by delete priority
+    global cleaner_candidates
+    print('Finding not recently accessed files...')
+    histogram = scan_stats.refresh_ages()
+    count, total_size = histogram.older_than(NOT_RECENTLY_ACCESSED_THRESHOLD)
+    print(str(count) + ' files with total size of ' + format_bytes(total_size) + ' are older than '
+          + str(NOT_RECENTLY_ACCESSED_THRESHOLD) + ' days (' + AGE_POLICY + ')')
 
+    cleaner = Cleaner(scan_stats.table, NOT_RECENTLY_ACCESSED_THRESHOLD, FILE_SIZE_COEFFICIENT,
+                      LAST_ACCESS_DATE_COEFFICIENT, NORMALIZATION_RATE, age_policy=AGE_POLICY)
+    # ranked against the time of the age bins, so the candidates are the files counted above
+    cleaner_candidates = [None] + [row for _, row in timed('ranking', cleaner.rank, 20, histogram.now)]
 
-def plot_extension_vs_totalsize_bar():
-    x, y = get_extension_to_size_array_tuples_sorted()
 
-    plt.figure(figsize=(30, 20))  # width:20, height:3
-    plt.bar(x[0:19], y[0:19], align='edge', width=0.8)  # graph the largest sized 20 extensions
-    plt.title("Extension Distribution by Size", fontsize=23, fontweight="bold")
-    plt.xlabel('Extensions', fontsize=25)
-    plt.ylabel('Total Size (MB)', fontsize=25)
-    plt.xticks(fontsize=8, fontweight='bold')
-    plt.yticks(fontsize=8, fontweight='bold')
-    plt.show()
+def set_default_root_dir():
+    global ROOT_DIRS
 
+    if USER_OS.startswith('darwin'):  # darwin is MacOS X
+        ROOT_DIRS = ['/Users/' + getpass.getuser()]
+    elif USER_OS.startswith('linux'):
+        ROOT_DIRS = ['~']
+    elif user_os_is_windows():
+        ROOT_DIRS = ['C:\\']  # @TODO: find the user files dir in Windows and use it instead to exclude os files
+    else:
+        print('Your OS is not supported')
 
-def plot_extension_vs_totalsize_treemap():
-    x, y = get_extension_to_size_array_tuples_sorted()
 
-    # create a color palette, mapped to these values
-    color_map = generate_blue_color_map(y)
+def set_custom_root_dirs(paths):
+    global ROOT_DIRS
+    ROOT_DIRS = paths
 
-    try:
-        squarify.plot(label=x[0:19], sizes=y[0:19], color=color_map)
-        plt.title("Extension Treemap by Size", fontsize=23, fontweight="bold")
 
-        # Remove our axes and display the plot
-        plt.axis('off')
-        plt.show()
-    except Exception:
-        print('An unexpected error occurred while displaying the treemap')
+def root_dirs_name():
+    return ', '.join(ROOT_DIRS)
 
 
-def generate_blue_color_map(data_set):
-    cmap = matplotlib.cm.Blues
-    min_value = min(data_set)
-    max_value = max(data_set)
-    norm = matplotlib.colors.Normalize(vmin=min_value, vmax=max_value)
-    return [cmap(norm(value)) for value in data_set]
+def print_file(file_name):
+    print('File: ' + file_name)
 
 
-def get_extension_to_size_array_tuples_sorted():
-    x = []
-    y = []
+def user_os_is_windows():
+    return USER_OS.startswith('win32' or 'nt')
 
-    for w in sorted(extension_dictionary, key=extension_dictionary.get):
-        x.append(w)
-        y.append(extension_dictionary[w].total_size / 1000000)
 
-    return x, y
+def size_charts():  # charts of show_size_stats, the shares of the files and of their total size per size bin
+    views = get_stats_views()
+    return [
+        Chart('count_to_size', draw_bar, bar_args(views.count_bins(percentage=True), 'File count % to size range',
+                                                  'Percentage of files covered (%)')),
+        Chart('total_size_to_size', draw_bar, bar_args(views.total_size_bins(percentage=True),
+                                                       'Total size % to size range', 'Total Size in Range (%)',
+                                                       {'fontsize': 15})),
+        Chart('count_to_size_cumulative', draw_bar,
+              bar_args(views.count_bins(percentage=True, cumulative=True), 'File count % to size range (Cumulative)',
+                       'Percentage of files covered (%)')),
+        Chart('total_size_to_size_cumulative', draw_bar,
+              bar_args(views.total_size_bins(percentage=True, cumulative=True),
+                       'Total size % to size range (Cumulative)', 'Total size covered (%)')),
+    ]
+
+
+def bar_args(bins, title, ylabel, title_font=None):  # arguments of draw_bar for a label -> value view
+    return list(bins), list(bins.values()), title, 'Range', ylabel, (15, 7), title_font
+
+
+def extension_charts():  # charts of show_extension_stats, the largest 20 extensions by total size
+    x, y = get_stats_views().extension_sizes()
+    return [
+        Chart('extension_sizes', draw_bar, (x[0:19], y[0:19], 'Extension Distribution by Size', 'Extensions',
+                                            'Total Size (MB)', (30, 20), None, True)),
+        Chart('extension_treemap', draw_treemap, (x[0:19], y[0:19], 'Extension Treemap by Size')),
+    ]
+
+
+def directory_charts():
+    # charts of show_dir_stats, a two level treemap of the largest subdirectories of the scan root split into
+    # their own largest subdirectories
+    treemap = get_stats_views().cached('directory treemap', directory_treemap_boxes)
+    if not treemap:
+        return []
+    root_path, boxes = treemap
+    return [Chart('directory_treemap', draw_directory_treemap,
+                  ('Directory Treemap by Size (' + root_path + ')', boxes))]
+
+
+def directory_treemap_boxes():  # (root path, [(label, total size, child sizes)]), False if there is nothing to draw
+    tree = scan_stats.directory_tree
+    if not tree.directories:
+        return False
+    root = max(tree.roots(), key=lambda directory: directory.total_size)
+    top_dirs = [directory for directory in tree.largest_subdirs(root, 19) if directory.total_size > 0]
+    if not top_dirs:
+        return False
+    boxes = []
+    for directory in top_dirs:
+        # the files directly inside the directory fill the space left by its subdirectories
+        child_sizes = [subdir.total_size for subdir in tree.largest_subdirs(directory, 10) if subdir.total_size > 0]
+        own_size = directory.total_size - sum(child_sizes)
+        if child_sizes and own_size > 0:
+            child_sizes.append(own_size)
+            child_sizes.sort(reverse=True)
+        boxes.append((os.path.basename(directory.path) + '\n' + format_bytes(directory.total_size),
+                      directory.total_size, child_sizes))
+    return root.path, boxes
+
+
+def display_charts(charts, output=sys.stdout):
+    # all windows are opened together, or with CHARTS_DIR the charts are saved there by a pool of processes
+    if CHARTS_DIR is None:
+        timed('plotting', show_charts, charts)
+    else:
+        paths = timed('plotting', render_charts, charts, CHARTS_DIR, CHART_FORMAT, CHART_WORKERS)
+        for path in paths:
+            print('Saved ' + path, file=output)
 
 
 def format_bytes(size):
@@ -365,119 +498,143 @@ def format_bytes(size):
     return str(size) + ' ' + power_labels[n] + 'bytes'
 
 
-def print_not_recently_accessed_files():
-    sort_not_recently_accessed_based_on_importance_score()
+def print_cleaner_candidates():
     i = 1
 
-    for file in top_20_not_recently_accessed:
-        if file:
-            print(str(i) + ') ' + file.path)
+    for row in cleaner_candidates:
+        if row is not None:
+            print(str(i) + ') ' + scan_stats.table.paths[row])
             i += 1
 
 
-def sort_not_recently_accessed_based_on_importance_score():
-    # sort the files with a function that calculates a priority to delete
-    # based on coefficients FILE_SIZE_COEFFICIENT and LAST_ACCESS_DATE_COEFFICIENT
-    not_recently_accessed_files.sort(key=lambda file: get_delete_priority(file))
-
-
-def get_delete_priority(file):
-    assign_priority_score(file)
-    return file.delete_priority
-
-
-def assign_priority_score(file):
-    time_since_last_access = file.time_since_last_access
-    file_size_normalized = file.size * NORMALIZATION_RATE
-    delete_priority = time_since_last_access * LAST_ACCESS_DATE_COEFFICIENT \
-                      + FILE_SIZE_COEFFICIENT * file_size_normalized
-    file.delete_priority = delete_priority
-
-
-def plot_count_to_size_distribution():
-    x = []
-    y = []
+def fill_cleaner_with_duplicates():
+    # every copy but the first path of each duplicate group is offered for deletion, largest groups first
+    global cleaner_candidates
+    print('Finding duplicate files...')
 
-    for key, value in count_to_size_bins.items():
-        x.append(key)
-        y.append(value)
+    finder = DuplicateFinder(scan_stats.table, workers=max(WORKERS, DUPLICATE_HASH_WORKERS))
+    groups = timed('duplicates', finder.find)
+    reclaimable = 0
+    for group in groups:
+        reclaimable += group.reclaimable
+    print(str(len(groups)) + ' groups of duplicate files, ' + format_bytes(reclaimable) + ' can be reclaimed')
 
-    plt.figure(figsize=(15, 7))
-    plt.bar(x, y, align='edge', width=0.8)
-    plt.title("File count % to size range", fontsize=23, fontweight="bold")
-    plt.xlabel('Range', fontsize=25)
-    plt.ylabel('Percentage of files covered (%)', fontsize=25)
-    plt.xticks(fontsize=8, fontweight='bold')
-    plt.yticks(fontsize=8, fontweight='bold')
-    plt.show()
+    cleaner_candidates = [None]
+    for group in groups[0:20]:
+        rows = sorted(group.rows, key=lambda row: scan_stats.table.paths[row])
+        print(format_bytes(group.reclaimable) + ' reclaimable, ' + str(len(rows)) + ' copies of '
+              + scan_stats.table.paths[rows[0]])
+        cleaner_candidates.extend(rows[1:])
+    del cleaner_candidates[21:]
 
 
-def plot_total_size_to_size_range_distribution():
-    x = []
-    y = []
-
-    for key, value in total_size_to_size_bins.items():
-        x.append(key)
-        y.append(value)
-
-    plt.figure(figsize=(15, 7))
-    plt.bar(x, y, align='edge', width=0.8)
-    plt.title('Total size % to size range', fontsize=15)
-    plt.xlabel('Range', fontsize=25)
-    plt.ylabel('Total Size in Range (%)', fontsize=25)
-    plt.xticks(fontsize=8, fontweight='bold')
-    plt.yticks(fontsize=8, fontweight='bold')
-    plt.show()
-
-
-def plot_count_to_size_distribution_cumulative():
-    x = []
-    y = []
-
-    for key, value in count_to_size_bins_cumulative.items():
-        x.append(key)
-        y.append(value)
-
-    plt.figure(figsize=(15, 7))
-    plt.bar(x, y, align='edge', width=0.8)
-    plt.title("File count % to size range (Cumulative)", fontsize=23, fontweight="bold")
-    plt.xlabel('Range', fontsize=25)
-    plt.ylabel('Percentage of files covered (%)', fontsize=25)
-    plt.xticks(fontsize=8, fontweight='bold')
-    plt.yticks(fontsize=8, fontweight='bold')
-    plt.show()
+def prompt_removal():
+    selection = input("Type the indexes of the files you want to delete, e.g. 1,3,5-9 or 'all', "
+                      "type 'f' to select files by a filter or 'r' to return\n")
+    while selection != 'r':
+        try:
+            if selection == 'f':
+                rows = query_files(input('Type the filter, ' + FILTER_HELP + '\n'))
+            else:
+                rows = select_ranks(selection)
+            delete_files(rows)
+            return
+        except ValueError as error:
+            selection = input(str(error) + ", try again, 'r' to return\n")
 
 
-def plot_size_range_to_total_size_distribution_cumulative():
-    x = []
-    y = []
+def get_query_index():
+    global query_index
+    if query_index is None:
+        query_index = QueryIndex(scan_stats.table)
+    return query_index
 
-    for key, value in total_size_to_size_bins_cumulative.items():
-        x.append(key)
-        y.append(value)
 
-    plt.figure(figsize=(15, 7))
-    plt.bar(x, y, align='edge', width=0.8)
-    plt.title("Total size % to size range (Cumulative)", fontsize=23, fontweight="bold")
-    plt.xlabel('Range', fontsize=25)
-    plt.ylabel('Total size covered (%)', fontsize=25)
-    plt.xticks(fontsize=8, fontweight='bold')
-    plt.yticks(fontsize=8, fontweight='bold')
-    plt.show()
+def query_files(filter_text):  # Returns the rows of the files matching the filter, raises ValueError
+    file_filter = FileFilter.parse(filter_text, AGE_POLICY)
+    return timed('query', get_query_index().query, file_filter)
 
 
-def remove_unused_file():
-    confirm = input("Are you sure you want to delete this file? Type 'y' to proceed, 'r' to return\n")
-    while confirm == 'y':
-        index = input("Type the index of the file you want to delete\n")
-        os.remove(top_20_not_recently_accessed[int(index)].path)
-        confirm = input('Continue deleting? Type y or n \n')
+def prompt_query():
+    filter_text = input('Type the filter, ' + FILTER_HELP + "\nor type 'r' to return\n")
+    while filter_text != 'r':
+        try:
+            rows = query_files(filter_text)
+            break
+        except ValueError as error:
+            filter_text = input(str(error) + ", try again, 'r' to return\n")
+    else:
+        return
+
+    total_size = sum(scan_stats.table.sizes[row] for row in rows)
+    print(str(len(rows)) + ' files with total size of ' + format_bytes(total_size) + ', the largest ones:')
+    for row in sorted(rows, key=lambda row: scan_stats.table.sizes[row], reverse=True)[0:QUERY_RESULTS]:
+        print(scan_stats.table.paths[row] + ' (' + format_bytes(scan_stats.table.sizes[row]) + ', '
+              + str(scan_stats.table.age(row, AGE_POLICY)) + ' days old)')
+
+
+def select_ranks(selection):  # '1,3,5-9' or 'all' -> rows of those cleaner candidates
+    if selection == 'all':
+        return cleaner_candidates[1:]
+    rows = []
+    for part in selection.split(','):
+        first, _, last = part.partition('-')
+        first = int(first)
+        last = int(last) if last else first
+        if first < 1 or last >= len(cleaner_candidates) or first > last:
+            raise ValueError('Invalid index ' + part.strip())
+        rows.extend(cleaner_candidates[first:last + 1])
+    return rows
+
+
+def delete_files(rows, confirmed=False):
+    # prints the plan, deletes the files once confirmed and removes them from scan_stats without a new scan
+    global cleaner_candidates, query_index
+    plan = DeletionPlan(scan_stats.table, rows)
+    print_deletion_plan(plan)
+    if len(plan) == 0:
+        return
+    if not confirmed and input("Type 'y' to delete these files, anything else to return\n") != 'y':
+        return
+
+    result = timed('deletion', plan.execute, scan_stats, max(WORKERS, DELETION_WORKERS))
+    print('Deleted ' + str(len(result.removed_rows)) + ' files, ' + format_bytes(result.removed_size) + ' freed')
+    for row, message in result.errors:
+        print('Could not delete ' + scan_stats.table.paths[row] + ': ' + message)
+    query_index = None
+    removed_rows = set(result.removed_rows)
+    cleaner_candidates = [None] + [row for row in cleaner_candidates[1:] if row not in removed_rows]
+
+
+def print_deletion_plan(plan):
+    print(str(len(plan)) + ' files, ' + format_bytes(plan.total_size) + ' in total would be deleted:')
+    for row in plan.rows[0:DELETION_PLAN_PATHS]:
+        print(scan_stats.table.paths[row] + ' (' + format_bytes(scan_stats.table.sizes[row]) + ')')
+    if len(plan) > DELETION_PLAN_PATHS:
+        print('... and ' + str(len(plan) - DELETION_PLAN_PATHS) + ' more')
+
+
+def clean(filter_text, confirmed):
+    # headless cleanup: deletes the files matching the filter, only prints the plan unless confirmed
+    print('Starting the analysis of ' + root_dirs_name() + ', this may take a while...')
+    find_all_files_and_dirs(ROOT_DIRS)
+    rows = timed('filter', FileFilter.parse(filter_text, AGE_POLICY).select, scan_stats.table)
+    if confirmed:
+        delete_files(rows, confirmed=True)
+    else:
+        print_deletion_plan(DeletionPlan(scan_stats.table, rows))
+        print('Dry run, nothing was deleted. Pass --yes to delete these files')
+    print_phase_timers()
 
 
 def read_command():
     command = input("Type 'show_size_stats' to see the distribution of files among different size bins, \n" +
                     "'show_extension_stats' to see the distribution of files among different extensions \n" +
-                    "and 'run_cleaner' to see advices about which files are unused and may be deleted, \n" +
+                    "'show_dir_stats' to see the largest directories and the size of any directory, \n" +
+                    "'show_age_stats' to see the sizes of old and large files for any age and size, \n" +
+                    "'run_cleaner' to see advices about which files are unused and may be deleted, \n" +
+                    "'find_duplicates' to see identical copies of files that may be deleted, \n" +
+                    "'query' to list the files matching a filter of extension, size, age and path, \n" +
                     "type 'quit' to exit\n")
     print(command)
     return command
@@ -487,52 +644,385 @@ def main():
     print("Welcome to blink file system analyzer")
     print("Starting the analysis, this may take a while...")
     start = time.time()
-    find_all_files_and_dirs(ROOT_DIR)
+    find_all_files_and_dirs(ROOT_DIRS)
     end = time.time()
     time_passed = end - start
     print('Analysis duration: ' + str(time_passed))
-    print('Number of files found: ' + str(num_of_files_found)
-          + ' with total size of: ' + format_bytes(total_size_of_found_files))
+    print('Number of files found: ' + str(scan_stats.num_of_files_found)
+          + ' with total size of: ' + format_bytes(scan_stats.total_size_of_found_files))
+    print_scan_counters()
 
     command = ''
 
     while command != 'quit':
         command = read_command()
 
+        # the plotting phase includes the time the plot windows stay open
         if command == 'show_size_stats':
-            fill_cumulative_bins()
             print_distributions()
-            plot_count_to_size_distribution()
-            plot_total_size_to_size_range_distribution()
-            convert_bins_to_percentage()
-            fill_cumulative_bins()
-            plot_count_to_size_distribution_cumulative()
-            plot_size_range_to_total_size_distribution_cumulative()
             print_distributions_percentage()
+            display_charts(size_charts())
         elif command == 'show_extension_stats':
             print_size_ext_pairs()
-            adjust_plot_style()
-            plot_extension_vs_totalsize_bar()
-            plot_extension_vs_totalsize_treemap()
+            display_charts(extension_charts())
+        elif command == 'show_dir_stats':
+            print_largest_directories(LARGEST_DIRECTORIES)
+            display_charts(directory_charts())
+            prompt_subtree()
+        elif command == 'show_age_stats':
+            print_age_size_bins()
+            prompt_age_query()
         elif command == 'run_cleaner':
-            find_not_recently_accessed_files()
-            fill_top_20_not_recently_accessed()
-            print_not_recently_accessed_files()
-            index = input("Type the index of the file you want to delete to remove or type 'r' to return\n")
+            fill_cleaner_with_not_recently_accessed()
+            print_cleaner_candidates()
+            prompt_removal()
+        elif command == 'query':
+            prompt_query()
+        elif command == 'find_duplicates':
+            fill_cleaner_with_duplicates()
+            print_cleaner_candidates()
+            prompt_removal()
+
+    print_phase_timers()
+    print('Goodbye!')
 
-            if index != 'r':
-                while int(index) > 20 or int(index) < 1 and index != 'r':
-                    index = input("Invalid input, try again, r to return \n")
-                else:
-                    remove_unused_file()
 
-    print('Goodbye!')
+def write_report(path, report_format, find_duplicates=False):
+    # headless mode: scan, stream the statistics and the cleaner candidates, no prompts and no plots
+    print('Starting the analysis of ' + root_dirs_name() + ', this may take a while...', file=sys.stderr)
+    start = time.time()
+    find_all_files_and_dirs(ROOT_DIRS)
+    time_passed = time.time() - start
+    print('Analysis duration: ' + str(time_passed), file=sys.stderr)
+    print_scan_counters(sys.stderr)
+
+    export_report(path, report_format, time_passed, find_duplicates)
+    if CHARTS_DIR is not None:
+        display_charts(size_charts() + extension_charts() + directory_charts(), sys.stderr)
+    print_phase_timers(sys.stderr)
+
+
+def write_query_report(filter_text, path, report_format):  # headless query, one record per matching file
+    print('Starting the analysis of ' + root_dirs_name() + ', this may take a while...', file=sys.stderr)
+    find_all_files_and_dirs(ROOT_DIRS)
+    rows = timed('query', FileFilter.parse(filter_text, AGE_POLICY).select, scan_stats.table)
+    output = sys.stdout if path == '-' else open(path, 'w', newline='')
+    try:
+        ReportWriter(output, report_format).write_files(scan_stats.table, rows, AGE_POLICY)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print_phase_timers(sys.stderr)
+
+
+def export_report(path, report_format, duration, find_duplicates=False):  # writes the report of the last scan
+    cleaner = Cleaner(scan_stats.table, NOT_RECENTLY_ACCESSED_THRESHOLD, FILE_SIZE_COEFFICIENT,
+                      LAST_ACCESS_DATE_COEFFICIENT, NORMALIZATION_RATE, age_policy=AGE_POLICY)
+    now = scan_stats.refresh_ages().now  # a report of --watch ranks and bins against the same time
+    output = sys.stdout if path == '-' else open(path, 'w', newline='')
+    try:
+        report = ReportWriter(output, report_format)
+        report.write_summary(root_dirs_name(), scan_stats, duration)
+        report.write_extensions(scan_stats)
+        report.write_size_bins(scan_stats)
+        report.write_age_size_bins(scan_stats)
+        report.write_directories(scan_stats.directory_tree.largest(LARGEST_DIRECTORIES))
+        ranked = timed('ranking', cleaner.rank, REPORT_CLEANER_CANDIDATES, now)
+        report.write_cleaner_candidates(scan_stats.table, ranked, AGE_POLICY)
+        if find_duplicates:
+            groups = timed('duplicates',
+                           DuplicateFinder(scan_stats.table, workers=max(WORKERS, DUPLICATE_HASH_WORKERS)).find)
+            report.write_duplicates(scan_stats.table, groups)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def write_scan_summary(path):
+    # shard mode: scan and save a summary, --merge combines it with the summaries of the other roots
+    print('Starting the analysis of ' + root_dirs_name() + ', this may take a while...', file=sys.stderr)
+    start = time.time()
+    find_all_files_and_dirs(ROOT_DIRS)
+    time_passed = time.time() - start
+    print('Analysis duration: ' + str(time_passed), file=sys.stderr)
+    print_scan_counters(sys.stderr)
+
+    cleaner = Cleaner(scan_stats.table, NOT_RECENTLY_ACCESSED_THRESHOLD, FILE_SIZE_COEFFICIENT,
+                      LAST_ACCESS_DATE_COEFFICIENT, NORMALIZATION_RATE, age_policy=AGE_POLICY)
+    ranked = timed('ranking', cleaner.rank, REPORT_CLEANER_CANDIDATES)
+    summary = ScanSummary.from_scan(scan_stats, ROOT_DIRS, time_passed, ranked, AGE_POLICY, REPORT_CLEANER_CANDIDATES,
+                                    LARGEST_DIRECTORIES)
+    timed('summary', summary.save, path)
+    print_phase_timers(sys.stderr)
+
+
+def merge_summaries(summary_paths, report_path, report_format, summary_path=None):
+    # combines the summaries of shards scanned in other processes or on other hosts into one report, or into
+    # one summary that can be merged again
+    summary = None
+    for path in summary_paths:
+        try:
+            shard = ScanSummary.load(path)
+            if summary is None:
+                summary = shard
+            else:
+                summary.merge(shard)
+        except (OSError, ValueError) as error:
+            sys.exit('blink.py: error: --merge ' + path + ': ' + str(error))
+    print('Merged ' + str(len(summary_paths)) + ' summaries of ' + summary.name() + ', '
+          + str(summary.num_of_files_found) + ' files with total size of '
+          + format_bytes(summary.total_size_of_found_files), file=sys.stderr)
+
+    if summary_path is not None:
+        summary.save(summary_path)
+    if report_path is None and summary_path is not None:
+        return
+    output = sys.stdout if report_path in (None, '-') else open(report_path, 'w', newline='')
+    try:
+        report = ReportWriter(output, report_format)
+        report.write_summary(summary.name(), summary, summary.duration)
+        report.write_extensions(summary)
+        report.write_size_bins(summary)
+        report.write_directories(summary.largest_directories(LARGEST_DIRECTORIES))
+        report.write_cleaner_candidate_records(summary.cleaner_candidates[:REPORT_CLEANER_CANDIDATES])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def watch(report_path, report_format):
+    # Linux monitor mode: scans once, then applies the inotify events of the tree to the statistics in batches.
+    # The report is written again after changes, at most once every WATCH_REPORT_INTERVAL seconds
+    print('Starting the analysis of ' + root_dirs_name() + ', this may take a while...', file=sys.stderr)
+    start = time.time()
+    find_all_files_and_dirs(ROOT_DIRS)
+    time_passed = time.time() - start
+    print('Analysis duration: ' + str(time_passed), file=sys.stderr)
+    print_scan_counters(sys.stderr)
+
+    # new reads only change the atime, they are not watched unless the cleaner ranks by atime
+    watcher = Watcher(scan_stats, ROOT_DIRS[0], rules=exclusion_rules, watch_access=AGE_POLICY == 'atime')
+    print('Watching for changes, press Ctrl-C to stop', file=sys.stderr)
+    last_report = 0
+    changed = report_path is not None
+    try:
+        while True:
+            if changed and time.time() - last_report >= WATCH_REPORT_INTERVAL:
+                write_watch_report(report_path, report_format, time_passed)
+                last_report = time.time()
+                changed = False
+
+            events = watcher.next_batch(WATCH_REPORT_INTERVAL)
+            if not events:
+                continue
+            batch_start = time.time()
+            changes = timed('watch', watcher.apply, events)
+            if changes is None:
+                print('The kernel dropped events, scanning again...', file=sys.stderr)
+                find_all_files_and_dirs(ROOT_DIRS)
+                watcher.resync(scan_stats)
+                changes = (0, 0, 0)
+            print(str(len(events)) + ' events: ' + str(changes[0]) + ' added, ' + str(changes[1]) + ' updated, '
+                  + str(changes[2]) + ' removed in ' + str(round(time.time() - batch_start, 3)) + 's, '
+                  + str(scan_stats.num_of_files_found) + ' files with total size of '
+                  + format_bytes(scan_stats.total_size_of_found_files), file=sys.stderr)
+            changed = report_path is not None
+    except KeyboardInterrupt:
+        if changed:
+            write_watch_report(report_path, report_format, time_passed)
+    finally:
+        watcher.close()
+    print_phase_timers(sys.stderr)
+
+
+def write_watch_report(path, report_format, duration):
+    if path == '-':
+        export_report(path, report_format, duration)
+    else:  # readers of the report never see a half written one
+        export_report(path + '.tmp', report_format, duration)
+        os.replace(path + '.tmp', path)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Blink file system analyzer')
+    parser.add_argument('root_dirs', nargs='*', metavar='root_dir',
+                        help='directories to analyze, defaults to the home directory. Several roots are scanned '
+                             'one after the other and their statistics are merged')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of threads that list directories in parallel (default: 1)')
+    parser.add_argument('--index', nargs='?', const=DEFAULT_INDEX_PATH, metavar='PATH',
+                        help='keep the scan in a SQLite index and only list directories that changed since '
+                             'the last run (default path: ' + DEFAULT_INDEX_PATH + ')')
+    parser.add_argument('--checkpoint', nargs='?', const=DEFAULT_CHECKPOINT_PATH, metavar='PATH',
+                        help='append a checkpoint of the running scan to PATH every --checkpoint-interval seconds, '
+                             'removed once the scan completes (default PATH: %(const)s)')
+    parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL, metavar='SECONDS',
+                        help='seconds between two checkpoints, longer when writing them would take more than '
+                             + str(round(CHECKPOINT_MAX_OVERHEAD * 100)) + '%% of the scan (default: %(default)s)')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted scan from the last checkpoint of --checkpoint, with the same '
+                             'root and options')
+    parser.add_argument('--report', metavar='PATH',
+                        help="run without prompts or plots and write the report to PATH, '-' for stdout")
+    parser.add_argument('--format', choices=REPORT_FORMATS, default='jsonl',
+                        help='format of the --report output (default: %(default)s)')
+    parser.add_argument('--summary', metavar='PATH',
+                        help='run without prompts or plots and save a compact JSON summary of the scan to PATH, '
+                             'summaries of disjoint roots are combined by --merge')
+    parser.add_argument('--merge', nargs='+', metavar='SUMMARY',
+                        help='merge the --summary files of scans of disjoint roots, e.g. shards scanned in '
+                             'separate processes or on other hosts, and write the report to --report (default: '
+                             'stdout) or the merged summary to --summary, nothing is scanned')
+    parser.add_argument('--duplicates', action='store_true',
+                        help='also hash the files and write the groups of duplicate files to the --report output')
+    parser.add_argument('--age-policy', choices=sorted(AGE_POLICIES), default=AGE_POLICY,
+                        help='timestamp the cleaner measures the age of a file from, use mtime or ctime on '
+                             'noatime/relatime mounts (default: %(default)s)')
+    parser.add_argument('--heap-limit', type=int, default=HEAP_LIMIT, metavar='K',
+                        help='largest files kept per extension, 0 keeps every file (default: %(default)s)')
+    parser.add_argument('--log-size-bins', type=float, metavar='BASE',
+                        help='use size bins growing by a factor of BASE from 1KB instead of the fixed bins')
+    parser.add_argument('--watch', action='store_true',
+                        help='Linux only: keep running after the scan and update the statistics from file system '
+                             'events, the --report output is written again after changes')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help='do not visit the entries matching the gitignore style PATTERN, e.g. node_modules, '
+                             '*.pyc, build/ (dirs only) or /var/cache (relative to the root), can be repeated')
+    parser.add_argument('--exclude-from', action='append', default=[], metavar='FILE',
+                        help='read --exclude patterns from FILE, one per line, e.g. a .gitignore')
+    parser.add_argument('--exclude-regex', action='append', default=[], metavar='REGEX',
+                        help='do not visit the entries whose path contains a match of REGEX, can be repeated')
+    parser.add_argument('--hidden', action='store_true', help='visit hidden files and dirs as well')
+    parser.add_argument('--one-file-system', action='store_true',
+                        help='do not descend into mount points of other file systems below the root')
+    parser.add_argument('--max-depth', type=int, metavar='N',
+                        help='only list directories up to N levels below the root')
+    parser.add_argument('--clean', metavar='FILTER',
+                        help='delete the files matching FILTER without prompts, only the plan is printed unless '
+                             '--yes is given. FILTER has ' + FILTER_HELP)
+    parser.add_argument('--yes', action='store_true', help='confirm the deletion of --clean')
+    parser.add_argument('--query', metavar='FILTER',
+                        help='write the files matching FILTER to the --report output (default: stdout) instead of '
+                             'the statistics, FILTER is given like for --clean')
+    parser.add_argument('--estimate', nargs='?', type=float, const=ESTIMATE_TIME_BUDGET, metavar='SECONDS',
+                        help='estimate the extension and size bin statistics from random walks through the tree '
+                             'instead of scanning all of it, walks until the file count and total size are known '
+                             'within --estimate-error or for at most SECONDS (default: '
+                             + str(ESTIMATE_TIME_BUDGET) + ')')
+    parser.add_argument('--estimate-error', type=float, default=ESTIMATE_RELATIVE_ERROR * 100, metavar='PERCENT',
+                        help='half width of the 95%% confidence intervals --estimate stops at, relative to the '
+                             'estimate (default: %(default)s)')
+    parser.add_argument('--charts', metavar='DIR',
+                        help='save the charts to DIR instead of showing them, drawn off-screen by worker processes; '
+                             'with --report every chart is saved after the report')
+    parser.add_argument('--chart-format', choices=CHART_FORMATS, default=CHART_FORMAT,
+                        help='file format of the charts saved by --charts (default: %(default)s)')
+    parser.add_argument('--chart-workers', type=int, metavar='N',
+                        help='processes that draw the charts saved by --charts (default: one per CPU)')
+    parser.add_argument('--no-progress', action='store_true',
+                        help='do not show the progress line while scanning, it is only shown on a terminal anyway')
+    parser.add_argument('--timings', action='store_true',
+                        help='time the walk, table, heap insert, binning, ranking and plotting phases')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='run under cProfile and save the stats to PATH, only the main thread is profiled')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='trace allocations with tracemalloc and print the peak and the top allocating lines')
+    arguments = parser.parse_args()
+    if arguments.watch and not USER_OS.startswith('linux'):
+        parser.error('--watch uses inotify, which is only available on Linux')
+    if arguments.estimate is not None and (arguments.report or arguments.watch or arguments.clean
+                                           or arguments.query):
+        parser.error('--estimate prints its own statistics, it can not be combined with --report, --watch, '
+                     '--clean or --query')
+    if arguments.merge and (arguments.root_dirs or arguments.watch or arguments.clean or arguments.query
+                            or arguments.estimate is not None):
+        parser.error('--merge only reads summaries, it can not be combined with roots, --watch, --clean, --query '
+                     'or --estimate')
+    if arguments.summary and not arguments.merge and (arguments.report or arguments.watch or arguments.clean
+                                                      or arguments.query or arguments.estimate is not None):
+        parser.error('--summary can only be combined with --merge')
+    if arguments.resume and arguments.checkpoint is None:
+        arguments.checkpoint = DEFAULT_CHECKPOINT_PATH
+    if arguments.checkpoint is not None and (arguments.index or arguments.merge or arguments.estimate is not None):
+        parser.error('--checkpoint and --resume can not be combined with --index, --merge or --estimate')
+    if len(arguments.root_dirs) > 1:
+        if arguments.watch or arguments.index or arguments.estimate is not None or arguments.checkpoint:
+            parser.error('--watch, --index, --estimate and --checkpoint take a single root')
+        roots = [('', os.path.abspath(os.path.expanduser(path))) for path in arguments.root_dirs]
+        overlap = overlapping_roots(roots)
+        if overlap is not None:
+            parser.error('the roots ' + overlap[0][1] + ' and ' + overlap[1][1] + ' overlap, their files would '
+                         'be counted twice')
+    for path in arguments.exclude_from:
+        try:
+            with open(path) as patterns:
+                arguments.exclude.extend(patterns.read().splitlines())
+        except OSError as error:
+            parser.error('--exclude-from: ' + str(error))
+    try:
+        ExclusionRules('.', arguments.exclude, arguments.exclude_regex)
+    except (ValueError, re.error) as error:
+        parser.error('--exclude: ' + str(error))
+    for option, filter_text in (('--clean', arguments.clean), ('--query', arguments.query)):
+        if filter_text is not None:
+            try:
+                FileFilter.parse(filter_text)
+            except ValueError as error:
+                parser.error(option + ': ' + str(error))
+    if arguments.heap_limit < 0:
+        parser.error('--heap-limit: K must be 0 or more')
+    if arguments.log_size_bins is not None and not arguments.log_size_bins > 1:
+        parser.error('--log-size-bins: BASE must be larger than 1')
+    return arguments
 
 
 if __name__ == '__main__':
-    if len(sys.argv) == 1:    # If the user did not pass any path, use the defaults
+    arguments = parse_arguments()
+
+    if not arguments.root_dirs:    # If the user did not pass any path, use the defaults
         set_default_root_dir()
     else:
-        set_custom_root_dir(sys.argv[1])
-
-    main()
\ No newline at end of file
+        set_custom_root_dirs(arguments.root_dirs)
+    WORKERS = arguments.workers
+    INDEX_PATH = arguments.index
+    CHECKPOINT_PATH = arguments.checkpoint
+    CHECKPOINT_INTERVAL = arguments.checkpoint_interval
+    RESUME = arguments.resume
+    HEAP_LIMIT = arguments.heap_limit or None
+    AGE_POLICY = arguments.age_policy
+    EXCLUDE_PATTERNS = arguments.exclude
+    EXCLUDE_REGEXES = arguments.exclude_regex
+    SKIP_HIDDEN = not arguments.hidden
+    ONE_FILE_SYSTEM = arguments.one_file_system
+    MAX_DEPTH = arguments.max_depth
+    if arguments.log_size_bins is not None:
+        SIZE_BOUNDARIES = SizeHistogram.log_scale(arguments.log_size_bins).boundaries
+    SHOW_PROGRESS = SHOW_PROGRESS and not arguments.no_progress
+    ESTIMATE_RELATIVE_ERROR = arguments.estimate_error / 100
+    CHARTS_DIR = arguments.charts
+    CHART_FORMAT = arguments.chart_format
+    CHART_WORKERS = arguments.chart_workers
+    if arguments.timings:
+        phase_timers = PhaseTimers()
+
+    profiler = Profiler(arguments.profile, arguments.trace_memory)
+    profiler.start()
+    try:
+        if arguments.merge:
+            merge_summaries(arguments.merge, arguments.report, arguments.format, arguments.summary)
+        elif arguments.summary is not None:
+            write_scan_summary(arguments.summary)
+        elif arguments.estimate is not None:
+            estimate(arguments.estimate)
+        elif arguments.clean is not None:
+            clean(arguments.clean, arguments.yes)
+        elif arguments.query is not None:
+            write_query_report(arguments.query, arguments.report or '-', arguments.format)
+        elif arguments.watch:
+            watch(arguments.report, arguments.format)
+        elif arguments.report is None:
+            main()
+        else:
+            write_report(arguments.report, arguments.format, arguments.duplicates)
+    finally:
+        profiler.stop()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Generates deterministic synthetic directory trees for the benchmarks, the same arguments always give the same tree.
+# Files are sparse (truncated to their size), so even large trees take little disk space.
+
+import argparse
+import math
+import os
+import random
+import time
+
+DEFAULT_EXTENSIONS = '.txt:20,.log:10,.jpg:10,.png:5,.py:15,.json:10,.o:10,.mp4:2,.zip:3,:5'
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def parse_extension_mix(mix):  # '.txt:20,.jpg:5,:1' -> (['.txt', '.jpg', ''], [20, 5, 1]), '' means no extension
+    extensions = []
+    weights = []
+    for item in mix.split(','):
+        extension, _, weight = item.partition(':')
+        extensions.append(extension)
+        weights.append(float(weight or 1))
+    return extensions, weights
+
+
+def make_dirs(root, depth, fan_out):  # full tree of the given depth and fan out, returns every directory
+    dirs = [root]
+    level = [root]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fan_out):
+                path = os.path.join(parent, 'dir' + str(i))
+                os.makedirs(path, exist_ok=True)
+                next_level.append(path)
+        dirs.extend(next_level)
+        level = next_level
+    return dirs
+
+
+def file_size(generator, distribution, mean_log_size, sigma, max_size):
+    if distribution == 'uniform':
+        return generator.randrange(max_size)
+    if distribution == 'fixed':
+        return min(int(2 ** mean_log_size), max_size)
+    # mean_log_size is the log2 of the median size, lognormvariate takes the natural log
+    return min(int(generator.lognormvariate(mean_log_size * math.log(2), sigma)), max_size)
+
+
+def generate(root, files=10000, depth=3, fan_out=8, distribution='lognormal', mean_log_size=12, sigma=2.5,
+             max_size=2 ** 32, extensions=DEFAULT_EXTENSIONS, atime_spread_days=365, seed=0, now=None):
+    generator = random.Random(seed)
+    if now is None:
+        now = time.time()
+    extension_list, weights = parse_extension_mix(extensions)
+    dirs = make_dirs(os.path.abspath(root), depth, fan_out)
+
+    for i in range(files):
+        directory = dirs[generator.randrange(len(dirs))]
+        extension = generator.choices(extension_list, weights)[0]
+        path = os.path.join(directory, 'file' + str(i) + extension)
+        with open(path, 'wb') as file:
+            file.truncate(file_size(generator, distribution, mean_log_size, sigma, max_size))
+        atime = now - generator.uniform(0, atime_spread_days) * SECONDS_PER_DAY
+        mtime = min(atime, now - generator.uniform(0, atime_spread_days) * SECONDS_PER_DAY)
+        os.utime(path, (atime, mtime))
+    return len(dirs)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic tree for the blink benchmarks')
+    parser.add_argument('root', help='directory the tree is generated in')
+    parser.add_argument('--files', type=int, default=10000, help='number of files (default: %(default)s)')
+    parser.add_argument('--depth', type=int, default=3, help='levels of directories (default: %(default)s)')
+    parser.add_argument('--fan-out', type=int, default=8, help='subdirectories per directory (default: %(default)s)')
+    parser.add_argument('--distribution', choices=['lognormal', 'uniform', 'fixed'], default='lognormal',
+                        help='file size distribution (default: %(default)s)')
+    parser.add_argument('--mean-log-size', type=float, default=12,
+                        help='log2 of the median (lognormal) or of every (fixed) file size (default: %(default)s)')
+    parser.add_argument('--sigma', type=float, default=2.5, help='spread of the lognormal sizes (default: %(default)s)')
+    parser.add_argument('--max-size', type=int, default=2 ** 32, help='largest file size (default: %(default)s)')
+    parser.add_argument('--extensions', default=DEFAULT_EXTENSIONS,
+                        help='extension:weight pairs, an empty extension means no extension (default: %(default)s)')
+    parser.add_argument('--atime-spread-days', type=float, default=365,
+                        help='access times are spread uniformly over this many past days (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+    num_of_dirs = generate(arguments.root, arguments.files, arguments.depth, arguments.fan_out,
+                           arguments.distribution, arguments.mean_log_size, arguments.sigma, arguments.max_size,
+                           arguments.extensions, arguments.atime_spread_days, arguments.seed)
+    print('Generated ' + str(arguments.files) + ' files in ' + str(num_of_dirs) + ' directories under '
+          + arguments.root)